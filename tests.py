@@ -1,3 +1,5 @@
+import os
+
 import numpy as np
 import pandas as pd
 import pytest
@@ -135,6 +137,891 @@ class TestUIDImplementations:
         assert result_diff2 >= 0, "local_diff2 should be non-negative"
         print(f"✓ local_diff: {result_diff:.6f}, local_diff2: {result_diff2:.6f}")
     
+# ============================================================================
+# CORPUS FIXTURES
+# ============================================================================
+
+VRT_HEADER = """<text>
+<text_id {text_id}>
+<text_author Doe, J.>
+<text_year {year}>
+<text_jrnl {journal}>
+"""
+
+# tokens: word lemma upos xpos idx head deprel s50 s10 s100 s200
+VRT_SENTENCE = """<s_sid {sent_id}>
+<s_s10local 1>
+The the DET DT 1 3 det 2.5 0 0 0
+new new ADJ JJ 2 3 amod 9.1 0 0 0
+method method NOUN NN 3 4 nsubj 12.4 0 0 0
+gives give VERB VBZ 4 0 root 6.0 0 0 0
+results result NOUN NNS 5 4 obj 8.3 0 0 0
+. . PUNCT . 6 4 punct 1.2 0 0 0
+</s_s10local>
+</s_sid>
+"""
+
+
+def write_vrt(path, text_id="rsta_1850_001", year=1850, journal="rsta",
+              n_sentences=2, extra=""):
+    """Write a small .vrt file in the format of the RSC export."""
+    content = VRT_HEADER.format(text_id=text_id, year=year, journal=journal)
+    for i in range(n_sentences):
+        content += VRT_SENTENCE.format(sent_id=f"s{i}")
+    content += extra + "</text>\n"
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+class TestPipeline:
+    """Test the pipelined read/parse/write execution mode."""
+
+    def test_results_are_saved_in_input_order(self, tmp_path):
+        from uid_np.pipeline import run_pipeline
+
+        paths = []
+        for i in range(10):
+            path = tmp_path / f"{i}.vrt"
+            path.write_text(f"line {i}\n", encoding="utf-8")
+            paths.append(str(path))
+
+        saved = []
+        run_pipeline(paths, lambda path, lines: lines[0].strip(),
+                     lambda path, result: saved.append(result), queue_size=1)
+
+        assert saved == [f"line {i}" for i in range(10)]
+
+    def test_error_in_parse_stage_is_raised(self, tmp_path):
+        from uid_np.pipeline import run_pipeline
+
+        path = tmp_path / "bad.vrt"
+        path.write_text("x\n", encoding="utf-8")
+
+        def parse(path, lines):
+            raise ValueError("malformed")
+
+        with pytest.raises(ValueError, match="malformed"):
+            run_pipeline([str(path)] * 5, parse, lambda path, result: None,
+                         queue_size=1)
+
+class TestQuarantine:
+    """Test that malformed units are skipped and reported."""
+
+    def test_malformed_sentence_is_quarantined(self, tmp_path):
+        from uid_np.get_NP_data import parse_sentences
+        from uid_np.quarantine import Quarantine
+
+        bad_sentence = VRT_SENTENCE.format(sent_id="bad").replace(" 3 det ", " x det ")
+        path = write_vrt(tmp_path / "rsta_1850_001.vrt", extra=bad_sentence)
+        quarantine = Quarantine(str(tmp_path / "quarantine.csv"))
+
+        NPs = parse_sentences(path, quarantine=quarantine)
+        quarantine.close()
+
+        assert len(NPs) == 4  # two NPs in each of the two good sentences
+        assert (quarantine.n_units, quarantine.n_tokens, quarantine.n_NPs) == (1, 6, 2)
+        rows = pd.read_csv(tmp_path / "quarantine.csv")
+        assert rows.loc[0, "unit"] == "sentence"
+        assert rows.loc[0, "line"] == 27
+
+    def test_malformed_sentence_raises_without_quarantine(self, tmp_path):
+        from uid_np.get_NP_data import parse_sentences
+
+        bad_sentence = VRT_SENTENCE.format(sent_id="bad").replace(" 3 det ", " x det ")
+        path = write_vrt(tmp_path / "rsta_1850_001.vrt", extra=bad_sentence)
+
+        with pytest.raises(ValueError):
+            parse_sentences(path)
+
+    def test_unreadable_file_does_not_stop_run(self, tmp_path):
+        from uid_np.get_NP_data import process_corpus_files
+
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        write_vrt(corpus / "rsta_1850_001.vrt")
+        (corpus / "rsta_1850_002.vrt").write_bytes(b"\xff\xfe")
+        output_file = tmp_path / "NP_data.csv"
+        output_file.touch()
+
+        process_corpus_files(str(corpus), str(output_file))
+
+        assert len(pd.read_csv(output_file)) == 4
+        assert len(pd.read_csv(tmp_path / "NP_data_quarantine.csv")) == 1
+
+    @pytest.mark.parametrize("pipelined", [False, True])
+    def test_skipped_files_count_their_tokens(self, tmp_path, capsys, pipelined):
+        from uid_np.get_NP_data import process_corpus_files
+
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        path = write_vrt(corpus / "rsta_1850_001.vrt")
+        with open(path, "ab") as f:
+            f.write(b"<note \xff>\n") # undecodable after the two sentences
+        output_file = tmp_path / "NP_data.csv"
+        output_file.touch()
+
+        process_corpus_files(str(corpus), str(output_file), pipelined=pipelined)
+
+        assert "Skipped 1 malformed units (12 tokens, 0 NPs)" in capsys.readouterr().out
+
+    def test_quarantine_never_overwrites_output(self, tmp_path):
+        from uid_np.get_NP_data import process_corpus_files
+
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        write_vrt(corpus / "rsta_1850_001.vrt")
+        bad_sentence = VRT_SENTENCE.format(sent_id="bad").replace(" 3 det ", " x det ")
+        write_vrt(corpus / "rsta_1850_002.vrt", text_id="rsta_1850_002", extra=bad_sentence)
+        output_file = tmp_path / "NP_data" # no .csv extension
+        output_file.touch()
+
+        process_corpus_files(str(corpus), str(output_file))
+        process_corpus_files(str(corpus), str(output_file))
+
+        assert len(pd.read_csv(output_file)) == 16
+        # the records of both runs are kept
+        assert len(pd.read_csv(tmp_path / "NP_data_quarantine.csv")) == 2
+
+
+class TestPhraseExtractor:
+    """Test the rule-based phrase extractor against get_NP_data.py."""
+
+    # "Isabell and Arianna submitted an abstract"
+    coordination = [
+        ["Isabell", "Isabell", "NOUN", "_", "1", "4", "nsubj", "10.0", "0", "0", "0"],
+        ["and", "and", "CCONJ", "_", "2", "3", "cc", "2.0", "0", "0", "0"],
+        ["Arianna", "Arianna", "NOUN", "_", "3", "1", "conj", "12.0", "0", "0", "0"],
+        ["submitted", "submit", "VERB", "_", "4", "0", "root", "7.0", "0", "0", "0"],
+        ["an", "a", "DET", "_", "5", "6", "det", "1.5", "0", "0", "0"],
+        ["abstract", "abstract", "NOUN", "_", "6", "4", "obj", "9.0", "0", "0", "0"],
+    ]
+    metadata = {"text_id": "rsta_1850_001", "author": None, "year": "1850", "journal": "rsta"}
+
+    def test_NP_rule_matches_get_NP_data(self):
+        from uid_np.get_NP_data import identify_NPs_in_sentence
+        from uid_np.get_phrase_data import (PHRASE_RULES, add_metrics, compile_rules,
+                                     identify_phrases_in_sentence)
+
+        NPs = identify_NPs_in_sentence(self.coordination, self.metadata)
+        phrases = add_metrics(*identify_phrases_in_sentence(
+            self.coordination, self.metadata, compile_rules({"NP": PHRASE_RULES["NP"]})))
+
+        assert [NP["NP_str"] for NP in NPs] == [p["phrase_str"] for p in phrases]
+        np.testing.assert_allclose([NP["uid_dev"] for NP in NPs],
+                                   [p["uid_dev"] for p in phrases])
+
+    def test_coordination_pruning_and_several_phrase_types(self):
+        from uid_np.get_phrase_data import PHRASE_RULES, compile_rules, identify_phrases_in_sentence
+
+        rules = compile_rules({name: PHRASE_RULES[name] for name in ["NP", "NP_nocoord", "clause"]})
+        phrases, _ = identify_phrases_in_sentence(self.coordination, self.metadata, rules)
+
+        assert [(p["phrase_type"], p["phrase_str"]) for p in phrases] == [
+            ("NP", "Isabell and Arianna"),
+            ("NP_nocoord", "Isabell"),
+            ("clause", "Isabell and Arianna submitted an abstract"),
+            ("NP", "an abstract"),
+            ("NP_nocoord", "an abstract"),
+        ]
+
+    def test_rules_need_lists_of_tags(self):
+        from uid_np.get_phrase_data import compile_rules
+
+        with pytest.raises(ValueError, match="head_upos of rule 'NP' must be a list"):
+            compile_rules({"NP": {"head_upos": "NOUN", "head_deprel": ["obj"]}})
+        with pytest.raises(ValueError, match="prune of rule 'NP' must be a list"):
+            compile_rules({"NP": {"head_upos": ["NOUN"], "prune": "conj"}})
+
+    def test_phrase_script_matches_NP_script(self, tmp_path):
+        from uid_np import get_NP_data, get_phrase_data
+
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        bad_sentence = VRT_SENTENCE.format(sent_id="bad").replace(" 3 det ", " x det ")
+        write_vrt(corpus / "rsta_1850_001.vrt", extra=bad_sentence)
+        for pipelined in (False, True):
+            get_NP_data.process_corpus_files(str(corpus), str(tmp_path / f"NP_{pipelined}.csv"),
+                                             pipelined=pipelined)
+            get_phrase_data.process_corpus_files(str(corpus), str(tmp_path / f"phrases_{pipelined}.csv"),
+                                                 rules={"NP": get_phrase_data.PHRASE_RULES["NP"]},
+                                                 pipelined=pipelined)
+
+            NPs = pd.read_csv(tmp_path / f"NP_{pipelined}.csv")
+            phrases = pd.read_csv(tmp_path / f"phrases_{pipelined}.csv")
+            assert list(NPs.NP_str) == list(phrases.phrase_str)
+            assert len(pd.read_csv(tmp_path / f"phrases_{pipelined}_quarantine.csv")) == 1
+
+
+class TestMetricRegistry:
+    """Test the vectorized measures in metrics.py against the implementations above."""
+
+    segments = [
+        TestUIDImplementations.test_surprisal_1,
+        [],
+        [4.2],
+        [1.0, 7.5],
+        TestUIDImplementations.test_surprisal_2,
+        TestUIDImplementations.test_surprisal_4,
+    ]
+
+    def test_registry_matches_reference_implementations(self):
+        from uid_np.metrics import compute_metrics_for
+
+        results = compute_metrics_for(self.segments, ["uid_dev", "local_diff", "local_diff2"])
+
+        for i in [0, 4, 5]:
+            np.testing.assert_allclose(results["uid_dev"][i], uid_simple(self.segments[i]), atol=1e-12)
+            np.testing.assert_allclose(results["local_diff"][i], local_diff(self.segments[i]), atol=1e-12)
+            np.testing.assert_allclose(results["local_diff2"][i], local_diff2(self.segments[i]), atol=1e-12)
+
+    def test_short_segments_are_nan(self):
+        from uid_np.metrics import METRICS, compute_metrics_for
+
+        results = compute_metrics_for(self.segments, list(METRICS))
+
+        for name, (min_len, _) in METRICS.items():
+            for i, segment in enumerate(self.segments[:5]):
+                assert np.isnan(results[name][i]) == (len(segment) < min_len), (name, i)
+
+        # autocorrelation is undefined for constant values
+        assert np.isnan(results["lag1_autocorr"][5])
+        np.testing.assert_allclose(results["norm_entropy"][5], 1.0)
+
+    def test_metric_names_are_checked(self, tmp_path, capsys):
+        from uid_np.cli import main
+        from uid_np.metrics import DEFAULT_METRICS, metric_names
+
+        assert metric_names(["max_jump", "uid_dev", "max_jump"], DEFAULT_METRICS) == ["max_jump"]
+        with pytest.raises(ValueError, match="max_jupm"):
+            metric_names(["max_jupm"])
+
+        write_vrt(tmp_path / "rsta_1850_001.vrt")
+        with pytest.raises(SystemExit):
+            main(["extract-sentence", str(tmp_path), str(tmp_path / "sents.csv"), "--extra-metrics", "max_jupm"])
+        assert "invalid choice" in capsys.readouterr().err
+        assert not (tmp_path / "sents.csv").exists()
+
+    def test_extra_metrics_of_NPs(self, tmp_path):
+        from uid_np.cli import main
+        from uid_np.metrics import compute_metrics_for
+
+        write_vrt(tmp_path / "rsta_1850_001.vrt")
+        main(["extract-np", str(tmp_path), str(tmp_path / "NP.csv"), "--extra-metrics", "max_jump", "uid_dev"])
+
+        NPs = pd.read_csv(tmp_path / "NP.csv")
+        assert list(NPs.columns[-2:]) == ["uid_dev_rel", "max_jump"]
+        expected = compute_metrics_for([[2.5, 9.1, 12.4], [8.3]] * 2, ["max_jump"])["max_jump"]
+        np.testing.assert_allclose(NPs.max_jump, expected)
+
+
+class TestEquivalence:
+    """Test that the fast paths give the same rows as the reference extractors."""
+
+    def test_fast_paths_match_reference_on_generated_corpus(self, tmp_path):
+        from uid_np.benchmark import check_equivalence, generate_corpus
+
+        generate_corpus(str(tmp_path), n_texts=4, n_sentences=50, seed=1)
+        file_paths = sorted(str(path) for path in tmp_path.glob("*.vrt"))
+
+        assert check_equivalence(file_paths) == {}
+
+    def test_compare_rows_reports_differences(self):
+        from uid_np.benchmark import compare_rows
+
+        ref = [{"a": "x", "b": 1.0, "c": np.nan}]
+        assert compare_rows(ref, [{"a": "x", "b": 1.0 + 1e-12, "c": np.nan}],
+                            [("a", "a"), ("b", "b"), ("c", "c")]) == []
+        assert len(compare_rows(ref, [{"a": "y", "b": 1.1, "c": 0.0}],
+                                [("a", "a"), ("b", "b"), ("c", "c")])) == 3
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_metrics_on_random_segment_layouts(self, seed):
+        from uid_np.metrics import METRICS, compute_metrics_for
+
+        rng = np.random.default_rng(seed)
+        # many short segments (lengths 0-2) and some NaN surprisal values
+        segments = [list(rng.uniform(0, 25, rng.integers(0, 8))) for _ in range(200)]
+        for segment in segments[::17]:
+            if segment:
+                segment[rng.integers(len(segment))] = np.nan
+
+        results = compute_metrics_for(segments, list(METRICS))
+
+        for i, segment in enumerate(segments):
+            diffs = np.diff(segment)
+            expected_uid_dev = np.mean(np.abs(diffs)) if len(segment) >= 3 else np.nan
+            expected_sigma = np.sqrt(np.mean((diffs - np.mean(diffs))**2)) if len(segment) >= 3 else np.nan
+            expected_max_jump = np.max(np.abs(diffs)) if len(segment) >= 3 else np.nan
+            expected_var = np.var(segment) if len(segment) >= 2 else np.nan
+            np.testing.assert_allclose(results["uid_dev"][i], expected_uid_dev, rtol=1e-10)
+            np.testing.assert_allclose(results["sigma_gamma"][i], expected_sigma, rtol=1e-10)
+            np.testing.assert_allclose(results["max_jump"][i], expected_max_jump, rtol=1e-10)
+            np.testing.assert_allclose(results["srp_var"][i], expected_var, rtol=1e-10)
+            # a NaN value only affects its own segment
+            for name in METRICS:
+                if not np.isnan(segment).any() and len(segment) >= 3:
+                    assert not np.isnan(results[name][i]), (name, i)
+
+
+class TestSampling:
+    """Test the stratified reservoir sampling mode."""
+
+    def run_sample(self, tmp_path, name, **kwargs):
+        from uid_np.get_NP_data import process_corpus_files
+
+        output_file = tmp_path / f"{name}.csv"
+        output_file.touch()
+        process_corpus_files(str(tmp_path / "corpus"), str(output_file), **kwargs)
+        return pd.read_csv(output_file)
+
+    def test_sample_is_capped_per_stratum_and_reproducible(self, tmp_path):
+        from uid_np.benchmark import generate_corpus
+
+        generate_corpus(str(tmp_path / "corpus"), n_texts=6, n_sentences=100)
+
+        full = self.run_sample(tmp_path, "full")
+        sample = self.run_sample(tmp_path, "sample", sample_size=3, seed=1)
+        again = self.run_sample(tmp_path, "again", sample_size=3, seed=1)
+
+        strata = ["year", "journal", "head_synt_role"]
+        assert sample.groupby(strata).size().max() == 3
+        assert set(map(tuple, sample[strata].values)) == set(map(tuple, full[strata].values))
+        pd.testing.assert_frame_equal(sample, again)
+
+    def test_texts_excluded_by_filter_are_skipped(self, tmp_path):
+        from uid_np.benchmark import generate_corpus
+
+        generate_corpus(str(tmp_path / "corpus"), n_texts=4, n_sentences=20)
+
+        sample = self.run_sample(tmp_path, "rsta", text_filter={"journal": ["rsta"]})
+
+        assert set(sample.journal) == {"rsta"}
+
+    def test_unknown_filter_and_strata_keys_stop_the_run(self, tmp_path, capsys):
+        from uid_np.cli import main
+        from uid_np.get_NP_data import process_corpus_files
+
+        (tmp_path / "corpus").mkdir()
+        write_vrt(tmp_path / "corpus" / "rsta_1850_001.vrt")
+        output_file = str(tmp_path / "NP_data.csv")
+
+        with pytest.raises(ValueError, match="decade"):
+            process_corpus_files(str(tmp_path / "corpus"), output_file, text_filter={"decade": [1850]})
+        with pytest.raises(ValueError, match="decade"):
+            process_corpus_files(str(tmp_path / "corpus"), output_file, sample_size=2, strata=["decade"])
+        for option in (["--only", "decade=1850"], ["--sample-size", "2", "--strata", "decade"]):
+            with pytest.raises(SystemExit):
+                main(["extract-np", str(tmp_path / "corpus"), output_file, *option])
+            assert "decade" in capsys.readouterr().err
+        assert not os.path.exists(output_file)
+        assert not (tmp_path / "NP_data_quarantine.csv").exists()
+
+    def test_NPs_which_cannot_be_extracted_are_not_sampled(self, tmp_path):
+        from uid_np.sampling import StratifiedReservoir
+
+        sampler = StratifiedReservoir(2, strata=["journal"])
+        sampler.offer(("rsta",)) # never placed
+        for item in ("a", "b"):
+            sampler.place(("rsta",), sampler.offer(("rsta",)), item)
+        assert sampler.items() == ["a", "b"]
+        assert sampler.seen == {("rsta",): 2}
+
+        # the surprisal of "method" is malformed in the first sentence
+        (tmp_path / "corpus").mkdir()
+        bad = VRT_SENTENCE.format(sent_id="bad").replace(" 12.4 ", " n/a ")
+        content = VRT_HEADER.format(text_id="rsta_1850_001", year=1850, journal="rsta") + bad
+        content += VRT_SENTENCE.format(sent_id="s0") + "</text>\n"
+        (tmp_path / "corpus" / "rsta_1850_001.vrt").write_text(content, encoding="utf-8")
+
+        sample = self.run_sample(tmp_path, "sample", sample_size=1)
+
+        assert list(sample.NP_str) == ["The new method", "results"]
+
+
+class TestCatalog:
+    """Test the metadata catalog and pre-filtering with it."""
+
+    def test_catalog_rows(self, tmp_path):
+        from uid_np.catalog import build_catalog
+
+        write_vrt(tmp_path / "rsta_1850_001.vrt", n_sentences=3)
+        write_vrt(tmp_path / "rstb_1900_002.vrt", text_id="rstb_1900_002",
+                  year=1900, journal="rstb", n_sentences=1)
+
+        catalog = build_catalog(str(tmp_path), str(tmp_path / "catalog.csv"))
+
+        assert catalog["rsta_1850_001.vrt"]["n_tokens"] == 18
+        assert catalog["rstb_1900_002.vrt"]["n_tokens"] == 6
+        assert catalog["rstb_1900_002.vrt"]["journal"] == "rstb"
+        assert catalog["rstb_1900_002.vrt"]["year"] == "1900"
+        assert list(pd.read_csv(tmp_path / "catalog.csv").text_id) == [
+            "rsta_1850_001", "rstb_1900_002"]
+
+    def test_token_count_ignores_blank_lines_and_indentation(self, tmp_path):
+        from uid_np.catalog import count_tokens
+
+        path = tmp_path / "blank.vrt"
+        path.write_bytes(b"<text>\n  <s_s10local 1>\n\n\n\na\n \t \r\n\r\n\r\nb\n\n</text>")
+
+        assert count_tokens(str(path)) == 2
+
+    def test_changed_files_are_checked_again(self, tmp_path):
+        from uid_np.catalog import build_catalog, select_files
+
+        write_vrt(tmp_path / "text_1.vrt")
+        write_vrt(tmp_path / "text_2.vrt", text_id="rsta_1900_002", year=1900)
+        catalog = build_catalog(str(tmp_path), str(tmp_path / "catalog.csv"))
+        # text_2 becomes an rstb text after the catalog was built
+        write_vrt(tmp_path / "text_2.vrt", text_id="rstb_1900_002", year=1900, journal="rstb",
+                  n_sentences=3)
+
+        selected = select_files(str(tmp_path), catalog, {"journal": {"rsta"}})
+
+        assert selected == [str(tmp_path / "text_1.vrt")]
+
+    def test_files_excluded_in_catalog_are_not_opened(self, tmp_path):
+        from uid_np.catalog import build_catalog
+        from uid_np.get_NP_data import process_corpus_files
+
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        write_vrt(corpus / "rsta_1850_001.vrt")
+        excluded = write_vrt(corpus / "rstb_1900_002.vrt", text_id="rstb_1900_002",
+                             year=1900, journal="rstb")
+        build_catalog(str(corpus), str(tmp_path / "catalog.csv"))
+        # would be quarantined if it was opened
+        stat = os.stat(excluded)
+        with open(excluded, "r+b") as f:
+            f.write(b"\xff")
+        os.utime(excluded, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        output_file = tmp_path / "NP_data.csv"
+        output_file.touch()
+        process_corpus_files(str(corpus), str(output_file), text_filter={"journal": ["rsta"]},
+                             catalog_file=str(tmp_path / "catalog.csv"))
+
+        assert set(pd.read_csv(output_file).journal) == {"rsta"}
+        assert not (tmp_path / "NP_data_quarantine.csv").exists()
+
+
+class TestSplitCorpusFile:
+    """Test that the parallel split gives the same files as the serial split."""
+
+    def test_parallel_split_matches_serial_split(self, tmp_path, capsys):
+        import filecmp
+
+        from uid_np import split_corpus_file
+
+        # corpus dump with rsta/rstb texts, another journal and a repeated text ID
+        parts = ["<corpus>\n"]
+        for i in range(12):
+            journal = ["rsta", "rstb", "rspa"][i % 3]
+            path = write_vrt(tmp_path / "text.vrt", text_id=f"{journal}_1850_{i % 10:03d}",
+                             journal=journal, n_sentences=i % 4 + 1)
+            parts.append(open(path, encoding="utf-8").read())
+        input_file = tmp_path / "corpus.vrt"
+        input_file.write_text("".join(parts) + "</corpus>\n", encoding="utf-8")
+
+        split_corpus_file.split_corpus_file(str(input_file), str(tmp_path / "serial"))
+        serial_output = capsys.readouterr().out.replace(str(tmp_path / "serial"), "out")
+        split_corpus_file.split_corpus_file_parallel(str(input_file), str(tmp_path / "parallel"),
+                                                     processes=3, chunk_size=1000)
+        parallel_output = capsys.readouterr().out.replace(str(tmp_path / "parallel"), "out")
+
+        files = sorted(os.listdir(tmp_path / "serial"))
+        assert files == sorted(os.listdir(tmp_path / "parallel"))
+        assert len(files) == 8
+        assert filecmp.cmpfiles(tmp_path / "serial", tmp_path / "parallel", files, shallow=False)[0] == files
+        assert serial_output == parallel_output
+
+
+class TestLibraryAPI:
+    """Test the in-process API against the csv output of the scripts."""
+
+    def test_extract_nps_matches_csv_output(self, tmp_path):
+        from uid_np.api import extract_nps
+        from uid_np.benchmark import generate_corpus
+        from uid_np.get_NP_data import process_corpus_files
+
+        generate_corpus(str(tmp_path / "corpus"), n_texts=3, n_sentences=30)
+        output_file = tmp_path / "NP_data.csv"
+        output_file.touch()
+        process_corpus_files(str(tmp_path / "corpus"), str(output_file))
+        csv_NPs = pd.read_csv(output_file).sort_values(["text_id", "NP_str"], ignore_index=True)
+
+        NPs, tokens = extract_nps(tmp_path / "corpus")
+
+        assert NPs.year.dtype == np.int64 and NPs.uid_dev.dtype == np.float64
+        NPs = NPs.sort_values(["text_id", "NP_str"], ignore_index=True)
+        pd.testing.assert_series_equal(NPs.uid_dev, csv_NPs.uid_dev)
+        pd.testing.assert_series_equal(NPs.NP_len, csv_NPs.NP_len)
+
+    def test_token_arrays_and_structured_arrays(self, tmp_path):
+        from uid_np.api import extract_nps, extract_sentences
+
+        path = write_vrt(tmp_path / "rsta_1850_001.vrt", n_sentences=1)
+
+        NPs, tokens = extract_nps(path, as_frame=False)
+        sentences = extract_sentences(path, extra_metrics=["max_jump"], as_frame=False)
+
+        assert list(NPs["NP_str"]) == ["The new method", "results"]
+        np.testing.assert_array_equal(tokens["offsets"], [0, 3, 4])
+        np.testing.assert_allclose(tokens["srp"][:3], [2.5, 9.1, 12.4])
+        assert list(tokens["word"][tokens["offsets"][1]:tokens["offsets"][2]]) == ["results"]
+        np.testing.assert_allclose(sentences["max_jump"], [7.1])
+
+
+class TestSentenceMemo:
+    """Test that memoized NPs of repeated sentences equal freshly extracted ones."""
+
+    def test_repeated_sentences_are_reused(self, tmp_path):
+        from uid_np.benchmark import compare_rows
+        from uid_np.get_NP_data import MEMO_NAMESPACE, parse_sentences
+        from uid_np.memo import SentenceMemo
+
+        first = write_vrt(tmp_path / "rsta_1850_001.vrt", n_sentences=3)
+        second = write_vrt(tmp_path / "rstb_1900_002.vrt", text_id="rstb_1900_002",
+                           year=1900, journal="rstb", n_sentences=3)
+        memo = SentenceMemo(maxsize=10, path=str(tmp_path / "memo.sqlite"), namespace=MEMO_NAMESPACE)
+
+        NPs = parse_sentences(first, memo=memo) + parse_sentences(second, memo=memo)
+        memo.close()
+
+        assert NPs == parse_sentences(first) + parse_sentences(second)
+        assert (memo.hits, memo.misses) == (5, 1)
+
+        # a new run finds the sentence in the sqlite file
+        memo = SentenceMemo(maxsize=10, path=str(tmp_path / "memo.sqlite"), namespace=MEMO_NAMESPACE)
+        NPs = parse_sentences(second, memo=memo)
+        expected = parse_sentences(second)
+        assert compare_rows(expected, NPs, [(key, key) for key in expected[0]]) == []
+        assert (memo.disk_hits, memo.hits, memo.misses) == (1, 2, 0)
+        memo.close()
+
+    def test_lru_is_bounded(self):
+        from uid_np.memo import SentenceMemo
+
+        memo = SentenceMemo(maxsize=2)
+        for key in [b"a", b"b", b"c"]:
+            memo.put(key, [])
+
+        assert list(memo.cache) == [b"b", b"c"]
+        assert memo.get(b"a") is None
+
+    def test_memo_errors_fall_back_to_extraction(self, tmp_path):
+        from uid_np.get_NP_data import parse_sentences
+        from uid_np.memo import SentenceMemo
+        from uid_np.quarantine import Quarantine
+
+        path = write_vrt(tmp_path / "rsta_1850_001.vrt", n_sentences=3)
+        memo = SentenceMemo(maxsize=1, path=str(tmp_path / "memo.sqlite"))
+        memo._db.close() # every lookup and store in the sqlite file fails
+        quarantine = Quarantine(str(tmp_path / "quarantine.csv"))
+
+        NPs = parse_sentences(path, quarantine=quarantine, memo=memo)
+
+        assert NPs == parse_sentences(path)
+        assert quarantine.n_units == 0
+        assert memo.errors == 3 # one failed lookup per sentence
+        assert "3 errors" in memo.summary()
+
+
+class TestNPContext:
+    """Test the NP-in-context columns and the sentence profile they come from."""
+
+    def test_profile_matches_direct_computation(self):
+        from uid_np.metrics import SentenceProfile
+
+        srp = TestUIDImplementations.test_surprisal_1
+        profile = SentenceProfile(srp)
+
+        assert profile.uid_dev() == uid_simple(srp)
+        assert [profile.transition(i) for i in range(1, len(srp))] == list(np.diff(srp))
+        assert np.isnan(profile.transition(0)) and np.isnan(profile.transition(len(srp)))
+        assert np.isnan(SentenceProfile(srp[:2]).uid_dev())
+
+    def test_sigma_gamma_of_almost_constant_differences(self, tmp_path):
+        from uid_np.get_sentence_data import parse_sentences
+
+        # linear ramp: all differences are equal, sigma_gamma is (almost) 0
+        srp = [5.0 + 0.37 * i for i in range(40)]
+
+        tokens = "".join(f"w{i} w NOUN NN {i} 0 root {value!r} 0 0 0\n" for i, value in enumerate(srp, start=1))
+        path = write_vrt(tmp_path / "ramp.vrt", n_sentences=0,
+                         extra=f"<s_sid ramp>\n<s_s10local 1>\n{tokens}</s_s10local>\n</s_sid>\n")
+        assert parse_sentences(path)[0]["sigma_gamma"] == np.std(np.diff(srp))
+
+    def test_NP_context_columns(self, tmp_path):
+        from uid_np.get_NP_data import parse_sentences
+
+        subject, obj = parse_sentences(write_vrt(tmp_path / "rsta_1850_001.vrt", n_sentences=1))
+
+        # srp of the sentence: 2.5 9.1 12.4 6.0 8.3 1.2
+        assert (subject["NP_start"], subject["sent_len"]) == (1, 6)
+        assert np.isnan(subject["pre_transition"])
+        np.testing.assert_allclose(subject["post_transition"], 6.0 - 12.4)
+        np.testing.assert_allclose(subject["uid_dev_rel"], ((6.6 + 3.3) / 2) / (25.7 / 5))
+
+        assert obj["NP_start"] == 5
+        np.testing.assert_allclose([obj["pre_transition"], obj["post_transition"]], [8.3 - 6.0, 1.2 - 8.3])
+        assert np.isnan(obj["uid_dev_rel"]) # NP too short for UIDev
+
+
+class TestPartitionedOutput:
+    """Test the partitioned output layout and its readers."""
+
+    def test_partitions_and_index(self, tmp_path):
+        from uid_np.get_NP_data import process_corpus_files
+        from uid_np.partitioned import iter_rows, read_index, select_parts
+
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        write_vrt(corpus / "rsta_1850_001.vrt")
+        write_vrt(corpus / "rstb_1903_002.vrt", text_id="rstb_1903_002", year=1903, journal="rstb")
+        output_folder = str(tmp_path / "NP_data")
+
+        process_corpus_files(str(corpus), output_folder, partition_by=("journal", "decade"))
+
+        assert [(entry["partition"], entry["part"], entry["n_rows"]) for entry in read_index(output_folder)] == [
+            ("journal=rsta/decade=1850", "part-rsta_1850_001.csv", "4"),
+            ("journal=rstb/decade=1900", "part-rstb_1903_002.csv", "4"),
+        ]
+        assert select_parts(output_folder, {"decade": range(1800, 1860, 10)}) == [
+            os.path.join(output_folder, "journal=rsta/decade=1850", "part-rsta_1850_001.csv")]
+        rows = list(iter_rows(output_folder, {"journal": ["rstb"]}))
+        assert {row["text_id"] for row in rows} == {"rstb_1903_002"}
+
+    def test_reextraction_rewrites_only_its_part(self, tmp_path):
+        from uid_np.get_NP_data import process_corpus_files
+        from uid_np.partitioned import read_index
+
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        write_vrt(corpus / "rsta_1850_001.vrt")
+        write_vrt(corpus / "rstb_1903_002.vrt", text_id="rstb_1903_002", year=1903, journal="rstb")
+        output_folder = str(tmp_path / "NP_data")
+        process_corpus_files(str(corpus), output_folder, partition_by=("journal", "decade"))
+        other_part = os.path.join(output_folder, "journal=rstb/decade=1900", "part-rstb_1903_002.csv")
+        os.utime(other_part, (0, 0))
+
+        # the year of one text has been corrected: its part moves to another partition
+        (corpus / "rstb_1903_002.vrt").unlink()
+        write_vrt(corpus / "rsta_1850_001.vrt", year=1861, n_sentences=1)
+        process_corpus_files(str(corpus), output_folder, partition_by=("journal", "decade"))
+
+        assert [(entry["partition"], entry["n_rows"]) for entry in read_index(output_folder)] == [
+            ("journal=rsta/decade=1860", "2"), ("journal=rstb/decade=1900", "4")]
+        assert not os.path.exists(os.path.join(output_folder, "journal=rsta/decade=1850", "part-rsta_1850_001.csv"))
+        assert os.path.getmtime(other_part) == 0
+
+    def test_texts_without_rows_lose_their_parts(self, tmp_path):
+        from uid_np.get_NP_data import process_corpus_files
+        from uid_np.partitioned import read_index
+
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        write_vrt(corpus / "rsta_1850_001.vrt")
+        write_vrt(corpus / "rstb_1903_002.vrt", text_id="rstb_1903_002", year=1903, journal="rstb")
+        output_folder = str(tmp_path / "NP_data")
+        process_corpus_files(str(corpus), output_folder, partition_by=("journal", "decade"))
+
+        # no NPs any more in one text, the other text is excluded by the filter
+        write_vrt(corpus / "rsta_1850_001.vrt", n_sentences=0)
+        process_corpus_files(str(corpus), output_folder, partition_by=("journal", "decade"),
+                             text_filter={"journal": ["rsta"]})
+
+        assert [entry["text_id"] for entry in read_index(output_folder)] == ["rstb_1903_002"]
+        assert not os.path.exists(os.path.join(output_folder, "journal=rsta/decade=1850", "part-rsta_1850_001.csv"))
+
+    def test_index_never_lists_removed_parts(self, tmp_path):
+        from uid_np.get_sentence_data import process_corpus_files
+        from uid_np.partitioned import read_index
+
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        write_vrt(corpus / "rsta_1850_001.vrt")
+        output_folder = tmp_path / "sentence_data"
+        process_corpus_files(str(corpus), str(output_folder), partition_by=("journal", "decade"))
+
+        # the part of the corrected text moves, then the run stops at a broken file
+        write_vrt(corpus / "rsta_1850_001.vrt", year=1861)
+        (corpus / "broken.vrt").write_text("<text>\n<text_id broken\n</text>\n", encoding="utf-8")
+        with pytest.raises(AttributeError):
+            process_corpus_files(str(corpus), str(output_folder), partition_by=("journal", "decade"))
+
+        for entry in read_index(str(output_folder)):
+            assert (output_folder / entry["partition"] / entry["part"]).exists()
+
+    def test_key_varying_within_a_text_keeps_all_rows(self, tmp_path):
+        from uid_np.get_NP_data import process_corpus_files
+        from uid_np.merge import merge_partitions
+        from uid_np.partitioned import iter_rows, read_index
+
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        write_vrt(corpus / "rsta_1850_001.vrt")
+        write_vrt(corpus / "rstb_1903_002.vrt", text_id="rstb_1903_002", year=1903, journal="rstb")
+        output_folder = str(tmp_path / "NP_data")
+        for _ in range(2):
+            process_corpus_files(str(corpus), output_folder, partition_by=("journal", "head_synt_role"))
+
+        assert [(entry["partition"], entry["n_rows"]) for entry in read_index(output_folder)] == [
+            ("journal=rsta/head_synt_role=nsubj", "2"), ("journal=rsta/head_synt_role=obj", "2"),
+            ("journal=rstb/head_synt_role=nsubj", "2"), ("journal=rstb/head_synt_role=obj", "2")]
+        assert len(list(iter_rows(output_folder))) == 8
+
+        merged_folder = str(tmp_path / "merged")
+        merge_partitions([output_folder, output_folder], merged_folder)
+        assert len(list(iter_rows(merged_folder))) == 8
+
+    def test_unknown_partition_keys_are_rejected(self, tmp_path):
+        from uid_np.get_NP_data import process_corpus_files
+
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        write_vrt(corpus / "rsta_1850_001.vrt")
+        with pytest.raises(ValueError, match="unknown partition keys"):
+            process_corpus_files(str(corpus), str(tmp_path / "NP_data"), partition_by=("jrnl",))
+
+    def test_texts_without_text_id_are_quarantined(self, tmp_path):
+        import csv
+        from uid_np.get_NP_data import process_corpus_files
+        from uid_np.partitioned import read_index
+
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        write_vrt(corpus / "rsta_1850_001.vrt")
+        for i in range(3):
+            path = write_vrt(corpus / f"broken_{i}.vrt")
+            with open(path, encoding="utf-8") as f:
+                content = f.read().replace("<text_id rsta_1850_001>", "<text_id broken")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+        output_folder = str(tmp_path / "NP_data")
+
+        process_corpus_files(str(corpus), output_folder, partition_by=("journal", "decade"))
+
+        assert [(entry["text_id"], entry["n_rows"]) for entry in read_index(output_folder)] == [
+            ("rsta_1850_001", "4")]
+        with open(os.path.join(output_folder, "_quarantine.csv"), newline="", encoding="utf-8") as f:
+            units = [(os.path.basename(row["file"]), row["unit"]) for row in csv.DictReader(f)]
+        assert sorted(unit for unit in units if unit[1] == "text") == [
+            (f"broken_{i}.vrt", "text") for i in range(3)]
+
+
+class TestServer:
+    """Test the local query service on a small corpus."""
+
+    def test_queries_and_answer_cache(self, tmp_path, capsys):
+        import threading
+        from uid_np.api import extract_nps
+        from uid_np.server import CorpusStore, QueryError, make_server, query
+
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        write_vrt(corpus / "rsta_1850_001.vrt")
+        write_vrt(corpus / "rstb_1903_002.vrt", text_id="rstb_1903_002", year=1903, journal="rstb")
+        store = CorpusStore(str(corpus), cache_file=str(tmp_path / "corpus.pkl"), workers=1)
+        store.load()
+        server = make_server(store, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+
+        try:
+            request = {"where": {"head_synt_role": "nsubj", "year": {"min": 1800, "max": 1899}},
+                       "measures": ["uid_dev"], "stats": ["count", "mean"], "group_by": ["journal"]}
+            answer = query(request, port=port)
+            NPs, _ = extract_nps(str(corpus))
+            expected = NPs[(NPs.head_synt_role == "nsubj") & (NPs.year <= 1899)].uid_dev
+            assert answer["columns"] == ["journal", "uid_dev_count", "uid_dev_mean"]
+            assert answer["rows"] == [["rsta", expected.count(), pytest.approx(expected.mean())]]
+
+            assert query(request, port=port) == answer
+            assert store.hits == 1
+
+            rows = query({"where": {"journal": "rstb"}, "columns": ["text_id", "NP_str"], "limit": 1}, port=port)
+            assert (rows["n_rows"], rows["rows"]) == (4, [["rstb_1903_002", "The new method"]])
+
+            with pytest.raises(QueryError, match="unknown column"):
+                query({"where": {"lemma": "method"}}, port=port)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        # a new store loads the tables from the cache file
+        cached = CorpusStore(str(corpus), cache_file=str(tmp_path / "corpus.pkl"))
+        capsys.readouterr()
+        cached.load()
+        assert "Loaded tables from" in capsys.readouterr().out
+        assert cached.tables["nps"].equals(store.tables["nps"])
+
+    def test_malformed_units_are_skipped_and_reported(self, tmp_path):
+        import json
+        from uid_np.server import CorpusStore
+
+        write_vrt(tmp_path / "rsta_1850_001.vrt")
+        bad = VRT_SENTENCE.format(sent_id="bad").replace(" 3 det ", " x det ")
+        write_vrt(tmp_path / "rstb_1903_002.vrt", text_id="rstb_1903_002", year=1903, journal="rstb", extra=bad)
+        (tmp_path / "broken.vrt").write_text("<text>\n<text_id broken\n</text>\n", encoding="utf-8")
+        store = CorpusStore(str(tmp_path), tables=("nps", "sentences"), workers=1)
+
+        store.load()
+
+        assert (len(store.tables["nps"]), len(store.tables["sentences"])) == (8, 5)
+        status = json.loads(json.dumps(store.status()))
+        assert {key: status["skipped"]["nps"][key] for key in ("units", "tokens", "NPs")} == {
+            "units": 2, "tokens": 6, "NPs": 2}
+        assert sorted(record[2] for record in status["skipped"]["nps"]["records"]) == ["metadata", "sentence"]
+        assert [record[2] for record in status["skipped"]["sentences"]["records"]] == ["file"]
+
+
+class TestCLI:
+    """Test the uid_np command line interface and the merge command."""
+
+    def test_extract_np_and_merge(self, tmp_path, capsys):
+        from uid_np.cli import main
+
+        corpus_1, corpus_2 = tmp_path / "corpus_1", tmp_path / "corpus_2"
+        corpus_1.mkdir()
+        corpus_2.mkdir()
+        write_vrt(corpus_1 / "rsta_1850_001.vrt")
+        write_vrt(corpus_2 / "rstb_1903_002.vrt", text_id="rstb_1903_002", year=1903, journal="rstb")
+
+        # one task per shard, then merge
+        for i in (1, 2):
+            assert main(["extract-np", str(tmp_path / f"corpus_{i}"), str(tmp_path / f"NP_{i}.csv")]) == 0
+        assert main(["merge", str(tmp_path / "NP_1.csv"), str(tmp_path / "NP_2.csv"), str(tmp_path / "NP.csv")]) == 0
+
+        merged = pd.read_csv(tmp_path / "NP.csv")
+        assert list(merged.text_id) == ["rsta_1850_001"] * 4 + ["rstb_1903_002"] * 4
+        assert list(merged.columns) == list(pd.read_csv(tmp_path / "NP_1.csv").columns)
+
+        # partitioned outputs
+        for i in (1, 2):
+            main(["extract-np", str(tmp_path / f"corpus_{i}"), str(tmp_path / f"parts_{i}"),
+                  "--partition-by", "journal", "decade"])
+        main(["merge", str(tmp_path / "parts_1"), str(tmp_path / "parts_2"), str(tmp_path / "parts")])
+
+        from uid_np.partitioned import read_partitions
+        assert len(read_partitions(str(tmp_path / "parts"))) == 8
+        assert len(read_partitions(str(tmp_path / "parts"), {"journal": ["rstb"]})) == 4
+
+    def test_unknown_command(self, capsys):
+        from uid_np.cli import main
+
+        assert main(["extract-foo"]) == 2
+        assert "unknown command" in capsys.readouterr().err
+
+    def test_merge_and_catalog_do_not_import_numpy(self):
+        import subprocess
+        import sys
+
+        code = "import sys, uid_np.cli, uid_np.merge, uid_np.catalog; print('numpy' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        assert result.stdout.strip() == "False"
+
+
 # ============================================================================
 # DEMONSTRATION
 # ============================================================================
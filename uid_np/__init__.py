@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+uid_np: extract NPs, phrases, sentences and documents from the RSC and
+calculate surprisal-based complexity measures
+
+The modules are not imported here, so that `uid_np <command>` only loads
+what its command needs (see cli.py).
+
+"""
+
+__version__ = '0.1.0'
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+library API: extract NPs, phrases, sentences and documents in-process
+- returns typed columnar tables (pandas DataFrames, or structured NumPy
+  arrays with as_frame=False) instead of writing csv files; numeric columns
+  are int64/float64, text columns are Python strings
+- the tokens of NPs and phrases are returned as flat arrays: the tokens of
+  row i are tokens[col][tokens['offsets'][i]:tokens['offsets'][i+1]]
+- paths can be a corpus folder, a .vrt file or a list of them
+
+example:
+    from uid_np.api import extract_nps
+    NPs, tokens = extract_nps('data/files')
+    NPs[NPs.head_synt_role == 'obj'].uid_dev.mean()
+
+"""
+
+import os
+
+import numpy as np
+
+
+# column types of the tables; year is an integer (-1 if missing)
+NP_COLUMNS = [('text_id', str), ('author', str), ('year', int), ('journal', str),
+              ('NP_len', int), ('NP_str', str), ('NP_pos', str),
+              ('head_lemma', str), ('head_synt_role', str),
+              ('avg_srp', float), ('sum_srp', float), ('uid_dev', float), ('sigma_gamma', float),
+              ('NP_start', int), ('sent_len', int), ('pre_transition', float),
+              ('post_transition', float), ('uid_dev_rel', float)]
+
+PHRASE_COLUMNS = [('text_id', str), ('author', str), ('year', int), ('journal', str),
+                  ('phrase_type', str), ('phrase_len', int), ('phrase_str', str), ('phrase_pos', str),
+                  ('head_lemma', str), ('head_upos', str), ('head_synt_role', str)]
+
+SENTENCE_COLUMNS = [('text_id', str), ('author', str), ('year', int), ('journal', str),
+                    ('sent_id', str), ('sent_len', int), ('sent_str', str),
+                    ('avg_srp', float), ('sum_srp', float), ('uid_dev', float), ('sigma_gamma', float)]
+
+DOCUMENT_COLUMNS = [('text_id', str), ('author', str), ('year', int), ('journal', str),
+                    ('doc_len', int), ('vocab_size', int),
+                    ('avg_srp', float), ('sum_srp', float), ('uid_dev', float), ('sigma_gamma', float)]
+
+# attributes of the tokens of an NP or phrase, in the order of get_NP_data.py
+TOKEN_COLUMNS = [('word', str), ('lemma', str), ('upos', str),
+                 ('parent', int), ('urel', str), ('srp', float)]
+
+
+# function to get the .vrt files of a folder, a file or a list of them
+def corpus_files(paths):
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    file_paths = []
+    for path in paths:
+        path = os.fspath(path)
+        if os.path.isdir(path):
+            file_paths.extend(sorted(os.path.join(path, file)
+                                     for file in os.listdir(path) if file.endswith('.vrt')))
+        else:
+            file_paths.append(path)
+    return file_paths
+
+
+# function to convert a value to the type of its column
+def _convert(value, kind):
+    if kind is int:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return -1
+    if kind is float:
+        return np.nan if value is None else float(value)
+    return '' if value is None else str(value)
+
+
+# function to build a structured array from a list of column value lists
+# - text_width: width of string columns, None for object columns (e.g. for
+#   the sentence strings, whose lengths vary a lot)
+def _structured(columns, values, text_width=None):
+    dtype = []
+    for name, kind in columns:
+        if kind is str:
+            if text_width is None:
+                dtype.append((name, object))
+            else:
+                width = max((len(value) for value in values[name]), default=1)
+                dtype.append((name, f'U{min(max(width, 1), text_width)}'))
+        else:
+            dtype.append((name, np.int64 if kind is int else np.float64))
+    table = np.empty(len(values[columns[0][0]]), dtype=dtype)
+    for name, kind in columns:
+        table[name] = values[name]
+    return table
+
+
+# function to turn rows (dicts) into a typed table
+def to_table(rows, columns, as_frame=True):
+    values = {name: [_convert(row.get(name), kind) for row in rows] for name, kind in columns}
+    if as_frame:
+        import pandas as pd
+        return pd.DataFrame({name: np.array(values[name], dtype=object if kind is str else kind)
+                             for name, kind in columns})
+    return _structured(columns, values)
+
+
+# function to turn the token lists of NPs or phrases into flat arrays
+def to_token_arrays(token_lists):
+    lengths = [len(tokens) for tokens in token_lists]
+    flat = [token for tokens in token_lists for token in tokens]
+    values = {name: [_convert(token[i], kind) for token in flat]
+              for i, (name, kind) in enumerate(TOKEN_COLUMNS)}
+    # words, lemmas and tags are short: fixed-width string arrays
+    table = _structured(TOKEN_COLUMNS, values, text_width=256)
+    arrays = {name: table[name] for name, kind in TOKEN_COLUMNS}
+    arrays['offsets'] = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+    return arrays
+
+
+# function to extract NPs as in get_NP_data.py
+# returns the NP table and the token arrays (see to_token_arrays)
+def extract_nps(paths, as_frame=True, quarantine=None, extra_metrics=()):
+    from . import get_NP_data
+    from .metrics import metric_names
+    extra_metrics = metric_names(extra_metrics, get_NP_data.NP_HEADER)
+    rows = []
+    for file_path in corpus_files(paths):
+        rows.extend(row for row in get_NP_data.parse_sentences(file_path, quarantine=quarantine,
+                                                               extra_metrics=extra_metrics)
+                    if row['NP'])
+    columns = NP_COLUMNS + [(name, float) for name in extra_metrics]
+    return (to_table(rows, columns, as_frame),
+            to_token_arrays([row['NP'] for row in rows]))
+
+
+# function to extract phrases as in get_phrase_data.py
+# returns the phrase table and the token arrays (see to_token_arrays)
+def extract_phrases(paths, rules=None, metrics=None, as_frame=True, quarantine=None):
+    from . import get_phrase_data
+    from .metrics import DEFAULT_METRICS, metric_names
+    rules = get_phrase_data.PHRASE_RULES if rules is None else rules
+    metrics = metric_names(DEFAULT_METRICS if metrics is None else metrics)
+    rows = []
+    for file_path in corpus_files(paths):
+        rows.extend(get_phrase_data.parse_sentences(file_path, rules=rules, metrics=metrics,
+                                                    quarantine=quarantine))
+    columns = PHRASE_COLUMNS + [(name, float) for name in metrics]
+    return (to_table(rows, columns, as_frame),
+            to_token_arrays([row['phrase'] for row in rows]))
+
+
+# function to extract sentences as in get_sentence_data.py
+def extract_sentences(paths, extra_metrics=(), as_frame=True):
+    from . import get_sentence_data
+    from .metrics import metric_names
+    extra_metrics = metric_names(extra_metrics, get_sentence_data.SENTENCE_HEADER)
+    rows = []
+    for file_path in corpus_files(paths):
+        rows.extend(get_sentence_data.parse_sentences(file_path, extra_metrics))
+    columns = SENTENCE_COLUMNS + [(name, float) for name in extra_metrics]
+    return to_table(rows, columns, as_frame)
+
+
+# function to extract documents as in get_document_data.py
+def extract_documents(paths, extra_metrics=(), as_frame=True):
+    from . import get_document_data
+    from .metrics import metric_names
+    extra_metrics = metric_names(extra_metrics, get_document_data.DOCUMENT_HEADER)
+    rows = []
+    for file_path in corpus_files(paths):
+        rows.extend(get_document_data.parse_sentences(file_path, extra_metrics)[0])
+    columns = DOCUMENT_COLUMNS + [(name, float) for name in extra_metrics]
+    return to_table(rows, columns, as_frame)
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+equivalence and performance harness for the extraction scripts
+- every fast path is compared with its reference implementation (e.g. the
+  rule-based phrase extractor with the NP rule vs. get_NP_data.py): the
+  rows must be identical, floats up to a tolerance
+- runs on a generated corpus or on a folder with real .vrt files
+- measures the throughput (tokens per second) of every extractor, compares
+  it with a stored baseline and flags regressions beyond a threshold
+
+usage:
+    uid_np bench                                  # generated corpus
+    uid_np bench --data-folder <folder>           # real corpus files
+    uid_np bench --update-baseline                # store new baseline
+
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+
+UPOS = ['NOUN', 'PROPN', 'VERB', 'AUX', 'ADJ', 'DET', 'ADP', 'PRON', 'CCONJ', 'PUNCT']
+DEPRELS = ['nsubj', 'nsubj:pass', 'obj', 'obl', 'nmod', 'amod', 'det', 'case',
+           'conj', 'cc', 'acl:relcl', 'advcl', 'ccomp', 'punct']
+
+
+# function to write a random corpus in the format of the RSC export
+def generate_corpus(data_folder, n_texts=20, n_sentences=200, max_len=40, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(data_folder, exist_ok=True)
+    for t in range(n_texts):
+        journal = ['rsta', 'rstb'][t % 2]
+        year = rng.randint(1665, 1996)
+        text_id = f'{journal}_{year}_{t:04d}'
+        lines = ['<text>', f'<text_id {text_id}>', f'<text_author Author {t % 7}>',
+                 f'<text_year {year}>', f'<text_jrnl {journal}>']
+        for s in range(n_sentences):
+            lines += [f'<s_sid {text_id}_s{s}>', '<s_s10local 1>']
+            n = rng.randint(1, max_len)
+            root = rng.randint(1, n)
+            for i in range(1, n + 1):
+                if i == root:
+                    head, deprel = 0, 'root'
+                else:
+                    # attach to an earlier token or the root to get a tree
+                    head = rng.choice([root] + list(range(max(1, i - 4), i)))
+                    head = root if head == i else head
+                    deprel = rng.choice(DEPRELS)
+                # word lemma upos xpos idx head deprel s50 s10 s100 s200
+                lines.append(f'w{i} lemma{rng.randint(0, 30)} {rng.choice(UPOS)} _ {i} '
+                             f'{head} {deprel} {rng.uniform(0, 25):.4f} 0 0 0')
+            lines += ['</s_s10local>', '</s_sid>']
+        lines.append('</text>')
+        with open(os.path.join(data_folder, f'{text_id}.vrt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+# function to count the tokens of a corpus folder (see catalog.count_tokens)
+def count_tokens(file_paths):
+    from .catalog import count_tokens as count_file_tokens
+    return sum(count_file_tokens(file_path) for file_path in file_paths)
+
+
+# function to compare two lists of rows
+# - columns: pairs (reference column, new column)
+# - floats are compared with a relative tolerance, NaN equals NaN
+def compare_rows(ref_rows, new_rows, columns, rtol=1e-9):
+    if len(ref_rows) != len(new_rows):
+        return [f'number of rows differs: {len(ref_rows)} != {len(new_rows)}']
+    differences = []
+    for i, (ref, new) in enumerate(zip(ref_rows, new_rows)):
+        for ref_col, new_col in columns:
+            a, b = ref[ref_col], new[new_col]
+            if isinstance(a, float) or isinstance(b, float):
+                if not np.isclose(a, b, rtol=rtol, atol=0, equal_nan=True):
+                    differences.append(f'row {i}, {ref_col}: {a!r} != {b!r}')
+            elif a != b:
+                differences.append(f'row {i}, {ref_col}: {a!r} != {b!r}')
+    return differences
+
+
+# ============================================================================
+# EXTRACTORS
+# ============================================================================
+
+NP_COLUMNS = [('text_id', 'text_id'), ('author', 'author'), ('year', 'year'),
+              ('journal', 'journal'), ('NP', 'phrase'), ('NP_len', 'phrase_len'),
+              ('NP_str', 'phrase_str'), ('NP_pos', 'phrase_pos'),
+              ('head_lemma', 'head_lemma'), ('head_synt_role', 'head_synt_role'),
+              ('avg_srp', 'avg_srp'), ('sum_srp', 'sum_srp'),
+              ('uid_dev', 'uid_dev'), ('sigma_gamma', 'sigma_gamma')]
+
+NP_MEMO_COLUMNS = [(name, name) for name in
+                   ['text_id', 'author', 'year', 'journal', 'NP', 'NP_len', 'NP_str', 'NP_pos',
+                    'head_lemma', 'head_synt_role', 'avg_srp', 'sum_srp', 'uid_dev', 'sigma_gamma',
+                    'NP_start', 'sent_len', 'pre_transition', 'post_transition', 'uid_dev_rel']]
+
+METRIC_COLUMNS = [(name, name) for name in ['avg_srp', 'sum_srp', 'uid_dev', 'sigma_gamma']]
+
+
+def np_reference(file_path):
+    from . import get_NP_data
+    return get_NP_data.parse_sentences(file_path)
+
+
+def np_phrase_rules(file_path):
+    from . import get_phrase_data
+    return get_phrase_data.parse_sentences(
+        file_path, rules={'NP': get_phrase_data.PHRASE_RULES['NP']})
+
+
+# NPs of the second pass over a file, all reused from the memo (kept in a
+# sqlite database in memory, so that they also go through pickle)
+def np_memoized(file_path):
+    from . import get_NP_data
+    from .memo import SentenceMemo
+    memo = SentenceMemo(maxsize=1, path=':memory:', namespace=get_NP_data.MEMO_NAMESPACE)
+    get_NP_data.parse_sentences(file_path, memo=memo)
+    NPs = get_NP_data.parse_sentences(file_path, memo=memo)
+    memo.close()
+    return NPs
+
+
+def sentence_reference(file_path):
+    from . import get_sentence_data
+    return get_sentence_data.parse_sentences(file_path)
+
+
+# function to get the surprisal values of every sentence of a file
+def sentence_surprisal(file_path):
+    from .get_NP_data import read_sentences
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return [[float(token[-4]) for token in sentence]
+                for metadata, sent_start, sentence in read_sentences(f)]
+
+
+# function to compute the default measures of segments with the metric
+# registry, one row {measure: value} per segment
+def registry_rows(segments):
+    from .metrics import DEFAULT_METRICS, compute_metrics_for
+    results = compute_metrics_for(segments, DEFAULT_METRICS)
+    return [dict(zip(DEFAULT_METRICS, values))
+            for values in zip(*(results[name].tolist() for name in DEFAULT_METRICS))]
+
+
+def sentence_metric_registry(file_path):
+    return registry_rows(sentence_surprisal(file_path))
+
+
+def document_reference(file_path):
+    from . import get_document_data
+    return get_document_data.parse_sentences(file_path)[0]
+
+
+def document_metric_registry(file_path):
+    srp_values = [value for sentence in sentence_surprisal(file_path) for value in sentence]
+    return registry_rows([srp_values]) if srp_values else []
+
+
+# equivalence checks: name -> (reference, fast path, compared columns)
+EQUIVALENCE_CHECKS = {
+    'NP: phrase rules vs. get_NP_data': (np_reference, np_phrase_rules, NP_COLUMNS),
+    'NP: sentence memo vs. get_NP_data': (np_reference, np_memoized, NP_MEMO_COLUMNS),
+    'sentence: metric registry vs. get_sentence_data': (sentence_reference, sentence_metric_registry, METRIC_COLUMNS),
+    'document: metric registry vs. get_document_data': (document_reference, document_metric_registry, METRIC_COLUMNS),
+    }
+
+# extractors timed for the throughput baseline
+BENCHMARKS = {
+    'np_reference': np_reference,
+    'np_phrase_rules': np_phrase_rules,
+    'sentence_reference': sentence_reference,
+    'sentence_metric_registry': sentence_metric_registry,
+    'document_reference': document_reference,
+    }
+
+
+# function to check all fast paths against their reference implementations
+def check_equivalence(file_paths, checks=EQUIVALENCE_CHECKS, rtol=1e-9):
+    failures = {}
+    for name, (reference, fast_path, columns) in checks.items():
+        differences = []
+        for file_path in file_paths:
+            for difference in compare_rows(reference(file_path), fast_path(file_path), columns, rtol):
+                differences.append(f'{os.path.basename(file_path)}: {difference}')
+        if differences:
+            failures[name] = differences
+    return failures
+
+
+# function to measure the throughput of every extractor in tokens per second
+# (best of `repeat` runs, to reduce the influence of other processes)
+def measure_throughput(file_paths, benchmarks=BENCHMARKS, repeat=3):
+    n_tokens = count_tokens(file_paths)
+    throughput = {}
+    for name, extractor in benchmarks.items():
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for file_path in file_paths:
+                extractor(file_path)
+            best = min(best, time.perf_counter() - start)
+        throughput[name] = n_tokens / best
+    return throughput
+
+
+# function to compare throughput with the baseline
+# returns the extractors which are slower than baseline * (1 - threshold)
+def find_regressions(throughput, baseline, threshold=0.2):
+    return {name: (baseline[name], tokens_per_sec)
+            for name, tokens_per_sec in throughput.items()
+            if name in baseline and tokens_per_sec < baseline[name] * (1 - threshold)}
+
+
+# function to run equivalence checks and benchmarks, returns an exit code
+def run(data_folder=None, baseline_file='bench_baseline.json', threshold=0.2,
+        update_baseline=False, repeat=3):
+    with tempfile.TemporaryDirectory() as tmp:
+        if data_folder is None:
+            data_folder = os.path.join(tmp, 'corpus')
+            generate_corpus(data_folder)
+        file_paths = sorted(os.path.join(data_folder, file)
+                            for file in os.listdir(data_folder) if file.endswith('.vrt'))
+
+        print(f'Checking equivalence on {len(file_paths)} files...')
+        failures = check_equivalence(file_paths)
+        for name in EQUIVALENCE_CHECKS:
+            print(f'  {"FAIL" if name in failures else "ok"}: {name}')
+            for difference in failures.get(name, [])[:10]:
+                print(f'      {difference}')
+
+        print('Measuring throughput...')
+        throughput = measure_throughput(file_paths, repeat=repeat)
+
+    baseline = {}
+    if os.path.exists(baseline_file):
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    regressions = find_regressions(throughput, baseline, threshold)
+
+    for name, tokens_per_sec in throughput.items():
+        line = f'  {name}: {tokens_per_sec:,.0f} tokens/s'
+        if name in baseline:
+            line += f' (baseline {baseline[name]:,.0f}, {tokens_per_sec / baseline[name] - 1:+.0%})'
+        if name in regressions:
+            line += ' REGRESSION'
+        print(line)
+
+    if update_baseline:
+        with open(baseline_file, 'w', encoding='utf-8') as f:
+            json.dump(throughput, f, indent=2)
+        print(f'Saved baseline to {baseline_file}')
+
+    return 1 if failures or regressions else 0
+
+
+# main function
+def main(argv=None, prog=None):
+
+    parser = argparse.ArgumentParser(prog=prog, description='Check fast paths against the reference extractors and measure throughput.')
+    parser.add_argument('--data-folder', help='folder with .vrt files (default: generated corpus)')
+    parser.add_argument('--baseline', default='bench_baseline.json',
+                        help='json file with the throughput baseline (default: bench_baseline.json)')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='flag extractors slower than the baseline by more than this fraction (default: 0.2)')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='store the measured throughput as new baseline')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of timed runs per extractor (default: 3)')
+    args = parser.parse_args(argv)
+
+    return run(args.data_folder, args.baseline, args.threshold,
+               args.update_baseline, args.repeat)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
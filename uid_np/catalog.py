@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+script to build a metadata catalog of the corpus files
+- reads only the metadata tags at the beginning of each .vrt file (text ID,
+  author, year, journal), no sentences are parsed
+- counts tokens without parsing the sentences (lines which are neither tags
+  nor empty)
+- writes one row per file, sorted by text ID, with file name, metadata,
+  size in bytes and number of tokens
+- files which haven't changed since the last build (same size and
+  modification time) are taken from the existing catalog
+- used by get_NP_data.py to select texts by their metadata without opening
+  them (--catalog with --only) and to process large files first; files
+  which have changed since the catalog was built are opened to read their
+  metadata
+
+usage:
+    uid_np catalog <corpus_folder> <catalog_file.csv>
+
+"""
+
+import os
+import re
+import csv
+import argparse
+
+from .metadata import METADATA_TAGS
+
+
+CATALOG_HEADER = ['file', 'text_id', 'author', 'year', 'journal',
+                  'size_bytes', 'mtime', 'n_tokens']
+
+
+# function to read the metadata tags at the beginning of a corpus file
+def read_header(file_path):
+    metadata = {key: None for key in METADATA_TAGS}
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('<s_'): # first sentence: header is over
+                break
+            for key, (tag, pattern) in METADATA_TAGS.items():
+                if line.startswith(tag):
+                    match = re.search(pattern, line)
+                    metadata[key] = match.group(1) if match else None
+                    break
+    return metadata
+
+
+# function to count the tokens of a corpus file without parsing it
+# (token lines are all lines which are neither tags nor empty after
+# stripping whitespace, as in get_NP_data.read_sentences)
+def count_tokens(file_path):
+    n_tokens = 0
+    with open(file_path, 'rb') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith(b'<'):
+                n_tokens += 1
+    return n_tokens
+
+
+# function to read a catalog file, indexed by file name
+def load_catalog(catalog_file):
+    with open(catalog_file, 'r', newline='', encoding='utf-8') as f:
+        catalog = {}
+        for row in csv.DictReader(f):
+            row['size_bytes'] = int(row['size_bytes'])
+            row['mtime'] = float(row['mtime'])
+            row['n_tokens'] = int(row['n_tokens']) if row['n_tokens'] else None
+            catalog[row['file']] = row
+        return catalog
+
+
+# function to build (or update) the catalog of a corpus folder
+def build_catalog(data_folder, catalog_file, with_tokens=True):
+    previous = load_catalog(catalog_file) if os.path.exists(catalog_file) else {}
+
+    rows = []
+    for file in os.listdir(data_folder):
+        if not file.endswith('.vrt'):
+            continue
+        stat = os.stat(os.path.join(data_folder, file))
+
+        # reuse the row of an unchanged file
+        row = previous.get(file)
+        if (row is not None and row['size_bytes'] == stat.st_size and row['mtime'] == stat.st_mtime
+                and (row['n_tokens'] is not None or not with_tokens)):
+            rows.append(row)
+            continue
+
+        file_path = os.path.join(data_folder, file)
+        row = {'file': file, **read_header(file_path),
+               'size_bytes': stat.st_size, 'mtime': stat.st_mtime,
+               'n_tokens': count_tokens(file_path) if with_tokens else None}
+        rows.append(row)
+
+    rows.sort(key=lambda row: (row['text_id'] or '', row['file']))
+    with open(catalog_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CATALOG_HEADER)
+        writer.writeheader()
+        writer.writerows(rows)
+    return {row['file']: row for row in rows}
+
+
+# function to select the files of a corpus folder with the catalog
+# - text_filter {metadata key: allowed values} is checked against the catalog,
+#   so files which are not selected are never opened
+# - files which are not in the catalog or have changed since it was built
+#   (other size or modification time) are opened to read their metadata;
+#   files whose header can't be read are kept
+# - largest files first, so that the last files of a run are small ones
+def select_files(data_folder, catalog, text_filter=None):
+    selected = []
+    for file in os.listdir(data_folder):
+        if not file.endswith('.vrt'):
+            continue
+        file_path = os.path.join(data_folder, file)
+        stat = os.stat(file_path)
+        row = catalog.get(file)
+        if text_filter and (row is None or row['size_bytes'] != stat.st_size
+                            or row['mtime'] != stat.st_mtime):
+            try:
+                row = read_header(file_path)
+            except (OSError, ValueError): # kept, quarantined by the extraction
+                row = None
+        if row is not None and text_filter and any(
+                str(row[key]) not in allowed for key, allowed in text_filter.items()):
+            continue
+        selected.append((stat.st_size, file))
+    selected.sort(key=lambda item: (-item[0], item[1]))
+    return [os.path.join(data_folder, file) for size, file in selected]
+
+
+# main function
+def main(argv=None, prog=None):
+
+    parser = argparse.ArgumentParser(prog=prog, description='Build a metadata catalog of .vrt corpus files.')
+    parser.add_argument('data_folder', help='folder with .vrt corpus files')
+    parser.add_argument('catalog_file', help='csv file for the catalog')
+    parser.add_argument('--no-tokens', action='store_true',
+                        help="don't count tokens (only read the metadata tags)")
+    args = parser.parse_args(argv)
+
+    catalog = build_catalog(args.data_folder, args.catalog_file, with_tokens=not args.no_tokens)
+    print(f'Catalog of {len(catalog)} files written to {args.catalog_file}')
+
+
+if __name__ == "__main__":
+    main()
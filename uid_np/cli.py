@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+command line interface: `uid_np <command> [arguments]`
+- every command runs the main function of one module with the remaining
+  arguments, e.g. `uid_np extract-np <corpus_folder> <csv_file> --strict`
+  is the same as `python -m uid_np.get_NP_data <corpus_folder> <csv_file> --strict`
+- only the module of the command is imported (numpy is not imported by
+  `uid_np merge` and `uid_np catalog`, pandas only by the commands which need it), so that short
+  tasks of cluster array jobs don't pay for what they don't use
+
+usage:
+    uid_np --help
+    uid_np <command> --help
+
+"""
+
+import sys
+import importlib
+
+from . import __version__
+
+
+# command -> (module, description)
+COMMANDS = {
+    'split': ('split_corpus_file', 'split a corpus export into one file per rsta/rstb text'),
+    'catalog': ('catalog', 'build a metadata catalog of the corpus files'),
+    'extract-np': ('get_NP_data', 'extract NPs and their complexity measures'),
+    'extract-phrase': ('get_phrase_data', 'extract phrases selected by rules and their complexity measures'),
+    'extract-sentence': ('get_sentence_data', 'extract sentences and their complexity measures (--no-content: without the sentence strings)'),
+    'extract-document': ('get_document_data', 'extract documents and their complexity measures'),
+    'merge': ('merge', 'merge csv outputs or partitioned output folders of several runs'),
+    'serve': ('server', 'keep the parsed corpus in memory and answer queries on localhost'),
+    'bench': ('benchmark', 'check fast paths against the reference extractors and measure throughput'),
+    }
+
+
+# function to print the list of commands
+def print_usage(file=sys.stdout):
+    print('usage: uid_np <command> [arguments]\n\ncommands:', file=file)
+    for command, (module, description) in COMMANDS.items():
+        print(f'  {command:<18}{description}', file=file)
+    print("\nrun 'uid_np <command> --help' for the arguments of a command", file=file)
+
+
+# main function
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ('-h', '--help'):
+        print_usage(sys.stdout if argv else sys.stderr)
+        return 0 if argv else 2
+    if argv[0] == '--version':
+        print(f'uid_np {__version__}')
+        return 0
+
+    command, arguments = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"uid_np: unknown command '{command}'\n", file=sys.stderr)
+        print_usage(sys.stderr)
+        return 2
+
+    module = COMMANDS[command][0]
+    if command == 'extract-sentence' and '--no-content' in arguments:
+        arguments.remove('--no-content')
+        module = 'get_sentence_data_no_content'
+
+    return importlib.import_module(f'.{module}', __package__).main(arguments, prog=f'uid_np {command}') or 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,531 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Nov  8 16:45:23 2024
+
+@author: isabell
+
+script to get relevant NPs from corpus files and write info to csv
+- consider only NPs tagged as 'NOUN'
+- consider only subjects and direct objects
+- extract entire NP: head with all dependents
+- extract relevant annotation for each token in NP (word, lemma, upos, head/parent, urel, s50local)
+- calculate Information Fluctuation Complexity based on surprisal annotation
+- NP in context: position and length of the sentence, surprisal transitions
+  into and out of the NP, UIDev relative to the sentence UIDev
+- extract metadata: text ID, author, year, journal, primary topic
+- optionally further measures from metrics.py (--extra-metrics)
+
+"""
+
+import os
+import re
+import csv
+import argparse
+
+from collections import deque
+import numpy as np
+
+from .metadata import METADATA_TAGS
+from .metrics import METRICS, SentenceProfile, compute_metrics_for, metric_names
+from .pipeline import count_file_tokens, process_files
+
+# syntactic roles of NP heads: (passive) subjects and direct objects
+NP_HEAD_ROLES = ('nsubj', 'nsubj:pass', 'obj')
+
+# attributes which can define the strata of a sample (see sampling.py)
+STRATA_KEYS = (*METADATA_TAGS, 'head_lemma', 'head_synt_role')
+
+# version of the NP extraction for memo files (see memo.py):
+# change it when identify_NPs_in_sentence changes
+MEMO_NAMESPACE = 'NP-2'
+
+# csv header of the NP data
+NP_HEADER = ['text_id', 'author', 'year', 'journal', 
+             'NP', 'NP_len', 'NP_str', 'NP_pos', 'head_lemma', 'head_synt_role',
+             'avg_srp', 'sum_srp', 'uid_dev', 'sigma_gamma',
+             'NP_start', 'sent_len', 'pre_transition', 'post_transition', 'uid_dev_rel']
+
+
+# function to identify NPs in a sentence and calculate their complexity measures
+# - with a sampler (see sampling.py), only NPs which get into the sample are
+#   extracted; they are put into the sampler instead of being returned
+def identify_NPs_in_sentence(current_sentence, metadata, sampler=None):
+    
+    NPs_in_sentence = [] # list for all NPs found in current sentence
+    profile = None # surprisal differences of the sentence, see metrics.SentenceProfile
+    
+    children = {} # dictionary for heads with children
+    # create dependency graph of heads and their children
+    for idx, word in enumerate(current_sentence, start=1):
+        head = int(word[5]) # get the heads
+        children.setdefault(head, []).append(idx) # save children
+
+    # go through all the tokens in the current sentence
+    for idx, word in enumerate(current_sentence, start=1):
+        # if you encounter a noun which is (passive) subject or direct object
+        if word[2] == 'NOUN' and (word[6] == 'nsubj' or word[6] == 'nsubj:pass' or word[6] == 'obj'):
+            
+            # decide if the NP is sampled before extracting it
+            if sampler is not None:
+                stratum = sampler.stratum({**metadata, 'head_lemma': word[1], 'head_synt_role': word[6]})
+                slot = sampler.offer(stratum)
+                if slot is None:
+                    continue
+            
+            NP = [] # initialize list for current NP
+           
+            visited = set([idx]) # tokens that have been visited
+            queue = deque([idx]) # create double-ended queue
+
+            # go through queue
+            while queue:
+                current = queue.popleft() # take left element in queue
+                
+                for child in children.get(current, []):
+                    if child not in visited:
+                        visited.add(child)
+                        queue.append(child)
+                        
+            sorted_indices = sorted(visited)
+
+            # get NP tokens and following attributes:
+            # word, lemma, upos, head/parent, urel, s50
+            NP = [[current_sentence[i-1][0], # word
+                   current_sentence[i-1][1], # lemma
+                   current_sentence[i-1][2], # upos
+                   current_sentence[i-1][5], # parent
+                   current_sentence[i-1][6], # urel
+                   current_sentence[i-1][-4]] # s50
+                  for i in sorted_indices]
+            
+            head_synt_role = word[6]
+            head_lemma = word[1]
+            
+            if NP:
+                #for tok in NP:
+                    #print(tok)
+                # get surprisal values of all tokens
+                srp_values = [float(tok[-1]) for tok in NP]
+                avg_srp = sum(srp_values) / len(srp_values)
+                sum_srp = sum(srp_values)
+
+                if len(srp_values) < 3:
+                    uid_dev = np.nan
+                    sigma_gamma = np.nan
+                else:
+                    diffs = np.diff(srp_values)
+
+                    # this implementation matches conceptually line 369-378 of postprocess_eval_results.py in https://github.com/thomashikaru/word-order-uid/tree/tacl-share/evaluation
+                    # this implementation matches conceptually also the function in revisiting-uid.ipynb at https://github.com/rycolab/revisiting-uid/tree/main/src
+                    # and should be faithful to Collins' (2014) UIDev proposal
+                    uid_dev = np.mean(np.abs(diffs))
+
+                    # this implementation should be faithful to information fluctuation complexity applied to texts, as it appeared in Brasolin, Bienati (2025)
+                    sigma_gamma = np.sqrt(np.mean((diffs - np.mean(diffs))**2))
+                
+                # NP in its sentence: position, surprisal transitions into and
+                # out of the NP, UIDev relative to the sentence
+                if profile is None:
+                    profile = SentenceProfile([float(token[-4]) for token in current_sentence])
+                first, last = sorted_indices[0] - 1, sorted_indices[-1] - 1 # 0-based
+                sent_uid_dev = profile.uid_dev()
+                uid_dev_rel = uid_dev / sent_uid_dev if not np.isnan(uid_dev) and sent_uid_dev > 0 else np.nan
+                
+                # add current NP to list of NPs for current sentence
+    
+                # add NP data to list of all NPs in sentence
+                NPs_in_sentence.append({
+                    "text_id": metadata['text_id'],
+                    "author": metadata['author'],
+                    "year": metadata['year'],
+                    "journal": metadata['journal'],
+                    "NP": NP, 
+                    "NP_len": len(NP),
+                    "NP_str": ' '.join(token[0] for token in NP),
+                    "NP_pos": '_'.join(token[2] for token in NP),
+                    "head_lemma": head_lemma,
+                    "head_synt_role": head_synt_role,
+                    "avg_srp": avg_srp,
+                    "sum_srp": sum_srp,
+                    "uid_dev": uid_dev,
+                    "sigma_gamma": sigma_gamma,
+                    "NP_start": sorted_indices[0],
+                    "sent_len": len(current_sentence),
+                    "pre_transition": profile.transition(first),
+                    "post_transition": profile.transition(last + 1),
+                    "uid_dev_rel": uid_dev_rel
+                    })
+
+                if sampler is not None:
+                    sampler.place(stratum, slot, NPs_in_sentence.pop())
+
+    return NPs_in_sentence
+
+
+# function to identify NPs in a sentence, reusing the result for repeated sentences
+# (see memo.py; the memo stores the NPs without metadata)
+# - errors of the memo (e.g. a corrupt sqlite file) are counted by the memo
+#   and the NPs are extracted without it; errors of the extraction are raised
+#   as without a memo
+def identify_NPs_memoized(current_sentence, metadata, memo):
+    try:
+        key = memo.key(current_sentence)
+    except IndexError: # tokens with missing columns: extracted (or quarantined) as without a memo
+        return identify_NPs_in_sentence(current_sentence, metadata)
+    try:
+        NPs = memo.get(key)
+    except Exception as e:
+        memo.failed(e)
+        return identify_NPs_in_sentence(current_sentence, metadata)
+    if NPs is None:
+        NPs = [{name: value for name, value in NP.items() if name not in metadata}
+               for NP in identify_NPs_in_sentence(current_sentence, metadata)]
+        try:
+            memo.put(key, NPs)
+        except Exception as e:
+            memo.failed(e)
+    return [{**metadata, **NP} for NP in NPs]
+
+
+# function to count the NP heads of a sentence (used to report skipped NPs)
+def count_NP_heads(current_sentence):
+    return sum(1 for word in current_sentence
+               if len(word) > 6 and word[2] == 'NOUN' and word[6] in NP_HEAD_ROLES)
+
+
+# function to add further measures from metrics.py to NP rows, computed for
+# all NPs of a file (or of the sample) in one pass
+def add_extra_metrics(NPs, extra_metrics):
+    if extra_metrics and NPs:
+        results = compute_metrics_for([[float(token[-1]) for token in row['NP']] for row in NPs],
+                                      extra_metrics)
+        for name in extra_metrics:
+            for row, value in zip(NPs, results[name].tolist()):
+                row[name] = value
+    return NPs
+
+
+# function to extract sentences from corpus file
+def parse_sentences(file_path, quarantine=None, sampler=None, skip_text=None, memo=None,
+                    extra_metrics=(), metadata=None):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return parse_lines(f, quarantine=quarantine, source=file_path,
+                           sampler=sampler, skip_text=skip_text, memo=memo,
+                           extra_metrics=extra_metrics, metadata=metadata)
+
+
+# function to read the sentences from the lines of a corpus file
+# - yields (metadata, line number where the sentence starts, tokens) for every
+#   non-empty sentence; metadata is a dict which is updated by later tags
+# - without a quarantine, a malformed metadata line raises; with a quarantine
+#   (see quarantine.py) it's recorded there and its value is None
+# - skip_text(metadata) is called when the first sentence starts; if it
+#   returns True, the rest of the file is skipped
+# - metadata: dict to fill with the metadata of the text, so that the caller
+#   also gets it for texts without sentences (a new dict by default)
+def read_sentences(lines, quarantine=None, source=None, skip_text=None, metadata=None):
+    
+    # initialize variables for metadata
+    metadata = {} if metadata is None else metadata
+    metadata.update({'text_id': None, 'author': None, 'year': None, 'journal': None})
+    
+    current_sentence = [] # current sentence: list of tokens
+    in_sentence = False
+    sent_start = None # line number where current sentence starts
+    text_checked = False # skip_text has been called
+
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        
+        # extract metadata
+        for key, (tag, pattern) in METADATA_TAGS.items():
+            if line.startswith(tag):
+                match = re.search(pattern, line)
+                if match is None:
+                    reason = f'malformed {tag.strip()} line: {line!r}'
+                    if quarantine is None:
+                        raise ValueError(f'{source}, line {line_no}: {reason}')
+                    quarantine.add(source, line_no, 'metadata', reason)
+                    metadata[key] = None
+                else:
+                    metadata[key] = match.group(1)
+                break
+        
+        if re.match(r'<s_s10local\b.*>', line): # sentence starts
+            if skip_text is not None and not text_checked:
+                if skip_text(metadata):
+                    return
+                text_checked = True
+            in_sentence = True
+            current_sentence = [] # initialize list for current sentence
+            sent_start = line_no
+            
+        elif line == '</s_s10local>': # sentence ends
+            in_sentence = False
+            if current_sentence:
+                yield metadata, sent_start, current_sentence
+         
+        # while in the sentence
+        elif in_sentence: 
+            if line:  # skip empty lines
+                token = line.split()
+                current_sentence.append(token) # add tokens to current sentence
+
+
+# function to extract NPs from the lines of a corpus file
+# - without a quarantine, a malformed line raises
+# - with a quarantine (see quarantine.py), malformed metadata lines and
+#   sentences are recorded there and skipped
+# - skip_text, metadata: see read_sentences
+# - with a memo (see memo.py), the NPs of repeated sentences are reused
+#   (not together with a sampler, which decides per NP)
+# - extra_metrics: further measures from metrics.py (see add_extra_metrics);
+#   with a sampler, they are added to the sampled NPs by the caller
+def parse_lines(lines, quarantine=None, source=None, sampler=None, skip_text=None,
+                memo=None, extra_metrics=(), metadata=None):
+    extra_metrics = metric_names(extra_metrics, NP_HEADER)
+    
+    NPs_in_file = [] # list for all NPs found in current file
+
+    for metadata, sent_start, current_sentence in read_sentences(lines, quarantine, source,
+                                                                 skip_text, metadata):
+        try:
+            if memo is not None and sampler is None:
+                NPs_in_file.extend(identify_NPs_memoized(current_sentence, metadata, memo))
+            else:
+                NPs_in_file.extend(identify_NPs_in_sentence(current_sentence, metadata, sampler))
+        except Exception as e:
+            if quarantine is None:
+                raise
+            # skip the sentence and continue with the next one
+            quarantine.add(source, sent_start, 'sentence', e,
+                           n_tokens=len(current_sentence),
+                           n_NPs=count_NP_heads(current_sentence))
+
+    return add_extra_metrics(NPs_in_file, extra_metrics)
+
+
+# function to add NP data to csv file
+def save_to_csv(NPs_in_file, output_file, extra_metrics=()):   
+    # open output file
+    with open(output_file, 'a', newline = '', encoding = 'utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames = NP_HEADER + list(extra_metrics))
+        
+        # add header if output file is empty
+        if os.path.getsize(output_file) == 0:
+            writer.writeheader()
+        
+        # write NP data to file
+        for row in NPs_in_file:
+            if row['NP']: # only if there is NP data
+                writer.writerow(row)
+        
+    
+# function to check if a text is excluded by a filter {metadata key: allowed values}
+def excluded_by(text_filter, metadata):
+    return any(str(metadata[key]) not in allowed for key, allowed in text_filter.items())
+
+
+# function to process corpus files
+# - with strict=False, malformed units are skipped and written to
+#   <output_file>_quarantine.csv instead of stopping the run
+# - text_filter {metadata key: allowed values}: texts with other values are
+#   skipped after their metadata has been read
+# - unknown keys of text_filter or strata raise before any file is opened
+#   (they would make every file or sentence fail)
+# - with a catalog file (see catalog.py), text_filter is checked against the
+#   catalog so that excluded files are never opened, and large files are
+#   processed first
+# - with sample_size, only a stratified sample of at most sample_size NPs per
+#   stratum is extracted and written at the end (see sampling.py)
+# - with memo_size > 0, the NPs of up to memo_size distinct sentences are kept
+#   in memory and reused for repeated sentences; with a memo_file, they are
+#   also stored there and reused in later runs (see memo.py)
+# - with partition_by (e.g. ('journal', 'decade')), output_file is a folder
+#   and the NPs of each text are written to a part file in its partition,
+#   e.g. journal=rsta/decade=1850/part-<text_id>.csv (see partitioned.py);
+#   texts without a text ID are skipped and quarantined (raise with strict)
+# - extra_metrics: further measures from metrics.py added as columns
+def process_corpus_files(data_folder, output_file, pipelined=False, queue_size=4,
+                         strict=False, text_filter=None, catalog_file=None,
+                         sample_size=None, strata=('year', 'journal', 'head_synt_role'),
+                         seed=0, memo_size=0, memo_file=None, partition_by=None,
+                         extra_metrics=()):
+    extra_metrics = metric_names(extra_metrics, NP_HEADER)
+    unknown = [key for key in text_filter or {} if key not in METADATA_TAGS]
+    if unknown:
+        raise ValueError(f'unknown metadata keys: {unknown}, available: {list(METADATA_TAGS)}')
+    if sample_size is not None:
+        unknown = [key for key in strata if key not in STRATA_KEYS]
+        if unknown:
+            raise ValueError(f'unknown strata: {unknown}, available: {list(STRATA_KEYS)}')
+    if text_filter:
+        text_filter = {key: {str(value) for value in allowed}
+                       for key, allowed in text_filter.items()}
+
+    if catalog_file is not None:
+        # get paths of the .vrt files selected in the catalog
+        from .catalog import load_catalog, select_files
+        file_paths = select_files(data_folder, load_catalog(catalog_file), text_filter)
+    else:
+        # get paths of all .vrt files in corpus data folder
+        file_paths = [os.path.join(data_folder, file)
+                      for file in os.listdir(data_folder)
+                      if file.endswith('.vrt')]
+
+    sampler = None
+    if sample_size is not None:
+        from .sampling import StratifiedReservoir
+        sampler = StratifiedReservoir(sample_size, strata, seed)
+        # same order of files on every file system, for a reproducible sample
+        file_paths.sort()
+
+    skip_text = None
+    if text_filter:
+        skip_text = lambda metadata: excluded_by(text_filter, metadata)
+
+    partitions = None
+    if partition_by:
+        from .partitioned import PartitionedWriter, check_keys
+        check_keys(partition_by, NP_HEADER + extra_metrics)
+        partitions = PartitionedWriter(output_file, NP_HEADER + extra_metrics, partition_by)
+
+        # part files are named after the text ID, so texts without one are
+        # skipped (before their NPs are sampled) and quarantined in save_file
+        skip_text = lambda metadata: (metadata['text_id'] is None
+                                      or bool(text_filter) and excluded_by(text_filter, metadata))
+
+    # function to add NP data to the output
+    # (text_ids: texts which have been extracted, see PartitionedWriter.write)
+    def save(NPs_in_file, text_ids):
+        if partitions is not None:
+            partitions.write((row for row in NPs_in_file if row['NP']), text_ids)
+        else:
+            save_to_csv(NPs_in_file, output_file, extra_metrics)
+        print(f'Added NPs to output file: {output_file}')
+
+    quarantine = None
+    if not strict:
+        from .quarantine import Quarantine, quarantine_file_for
+        if partitions is not None:
+            quarantine = Quarantine(os.path.join(output_file, '_quarantine.csv'))
+        else:
+            quarantine = Quarantine(quarantine_file_for(output_file))
+
+    memo = None
+    if memo_size > 0 or memo_file is not None:
+        from .memo import SentenceMemo
+        memo = SentenceMemo(max(memo_size, 1), memo_file, namespace=MEMO_NAMESPACE)
+
+    # function to extract the NPs of one file, with the metadata of its text
+    def parse(file_path, lines):
+        metadata = {}
+        NPs_in_file = parse_lines(lines, quarantine=quarantine, source=file_path,
+                                  sampler=sampler, skip_text=skip_text, memo=memo,
+                                  extra_metrics=extra_metrics, metadata=metadata)
+        return metadata, NPs_in_file
+
+    # function to add the NPs of one file to the output (sampled NPs are
+    # added at the end); texts skipped by the filter are left as they are
+    extracted_texts = []
+    def save_file(file_path, result):
+        metadata, NPs_in_file = result
+        if text_filter and excluded_by(text_filter, metadata):
+            return
+        if partitions is not None and metadata['text_id'] is None:
+            reason = 'no text ID, which names the part file'
+            if quarantine is None:
+                raise ValueError(f'{file_path}: {reason}')
+            quarantine.add(file_path, None, 'text', reason, n_tokens=count_file_tokens(file_path))
+            return
+        extracted_texts.append(metadata['text_id'])
+        if sampler is None:
+            save(NPs_in_file, [metadata['text_id']])
+
+    try:
+        # go through each file, serially or with read, parse and write
+        # running concurrently (see pipeline.py)
+        process_files(file_paths, parse, save_file, pipelined=pipelined,
+                      queue_size=queue_size, quarantine=quarantine)
+
+        # add sampled NPs to output csv file
+        if sampler is not None:
+            print(sampler.summary())
+            save(add_extra_metrics(sampler.items(), extra_metrics), extracted_texts)
+    finally:
+        if partitions is not None:
+            partitions.close()
+            print(partitions.summary())
+        if memo is not None:
+            memo.close()
+            print(memo.summary())
+        if quarantine is not None:
+            quarantine.close()
+            print(quarantine.summary())
+        
+        
+        
+# main function
+def main(argv=None, prog=None):
+   
+    parser = argparse.ArgumentParser(prog=prog, description='Extract NPs and their surprisal-based complexity measures from .vrt corpus files.')
+    # data folder
+    # data_folder = 'C:/Users/isabell/Documents/UdS/Corpus_Analysis/RSC/LMM/analysis_20241018/data/rsc_v604_udpipe_srp_202410'
+    parser.add_argument('data_folder', help='folder with .vrt corpus files')
+    # output file
+    # output_file = 'C:/Users/isabell/Documents/UdS/Corpus_Analysis/RSC/LMM/analysis_20241018/data/NP_data.csv'
+    parser.add_argument('output_file', help='csv file the NP data is appended to (a folder with --partition-by)')
+    parser.add_argument('--pipelined', action='store_true',
+                        help='read, parse and write files concurrently')
+    parser.add_argument('--queue-size', type=int, default=4,
+                        help='max. number of files waiting between two pipeline stages (default: 4)')
+    parser.add_argument('--strict', action='store_true',
+                        help='stop at the first malformed line instead of skipping it')
+    parser.add_argument('--memo-size', type=int, default=0,
+                        help='reuse the NPs of repeated sentences, keeping up to this many sentences in memory (default: 0, off)')
+    parser.add_argument('--memo-file',
+                        help='sqlite file to keep the NPs of sentences between runs (implies --memo-size 100000 if not given)')
+    parser.add_argument('--only', nargs='+', default=[], metavar='KEY=VALUE',
+                        help=f'only process texts with these metadata values ({", ".join(METADATA_TAGS)}), e.g. journal=rsta year=1850 year=1900-1920')
+    parser.add_argument('--catalog',
+                        help='catalog file of the corpus folder (see catalog.py): --only is checked against it without opening the files')
+    parser.add_argument('--sample-size', type=int,
+                        help='extract a random sample of at most this many NPs per stratum')
+    parser.add_argument('--strata', nargs='+', default=['year', 'journal', 'head_synt_role'],
+                        choices=STRATA_KEYS, metavar='KEY',
+                        help=f'attributes defining the strata for --sample-size: {", ".join(STRATA_KEYS)} (default: year journal head_synt_role)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='random seed for --sample-size (default: 0)')
+    parser.add_argument('--partition-by', nargs='+', metavar='KEY', choices=('decade', *NP_HEADER),
+                        help='write one part file per text to partition folders by these keys, e.g. journal decade (see partitioned.py)')
+    parser.add_argument('--extra-metrics', nargs='+', default=[], choices=list(METRICS), metavar='METRIC',
+                        help=f'further measures to calculate: {", ".join(METRICS)} (see metrics.py)')
+    args = parser.parse_args(argv)
+
+    # metadata filter, e.g. {'journal': ['rsta'], 'year': ['1850', '1851']}
+    text_filter = {}
+    for condition in args.only:
+        key, _, value = condition.partition('=')
+        if key not in METADATA_TAGS:
+            parser.error(f"unknown metadata key in --only {condition}, available: {', '.join(METADATA_TAGS)}")
+        if key == 'year' and '-' in value: # year range
+            start, end = value.split('-')
+            text_filter.setdefault(key, []).extend(range(int(start), int(end) + 1))
+        else:
+            text_filter.setdefault(key, []).append(value)
+    
+    # process corpus files
+    process_corpus_files(args.data_folder, args.output_file,
+                         pipelined=args.pipelined, queue_size=args.queue_size,
+                         strict=args.strict, text_filter=text_filter,
+                         catalog_file=args.catalog,
+                         sample_size=args.sample_size, strata=args.strata,
+                         seed=args.seed,
+                         memo_size=args.memo_size or (100000 if args.memo_file else 0),
+                         memo_file=args.memo_file,
+                         partition_by=args.partition_by,
+                         extra_metrics=args.extra_metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,14 +14,24 @@ script to get relevant sentences from corpus files and write info to csv
 import os
 import re
 import csv
-import sys
+import argparse
 
 from collections import deque
 import numpy as np
 
+from .metrics import METRICS, compute_metrics_for, metric_names
+
+
+# csv header of the document data (followed by the extra measures)
+DOCUMENT_HEADER = ['text_id', 'author', 'year', 'journal', 
+                   'doc_len', 'vocab_size',
+                   'avg_srp', 'sum_srp', 'uid_dev', 'sigma_gamma']
+
 
 # function to extract sentences from corpus file
-def parse_sentences(file_path):
+# - extra_metrics: further measures from metrics.py
+def parse_sentences(file_path, extra_metrics=()):
+    extra_metrics = metric_names(extra_metrics, DOCUMENT_HEADER)
     
     # initialize variables for metadata
     text_id = None
@@ -119,18 +129,20 @@ def parse_sentences(file_path):
             "sigma_gamma": sigma_gamma
             })
 
+        # add extra measures
+        if extra_metrics:
+            results = compute_metrics_for([srp_values], extra_metrics)
+            for name in extra_metrics:
+                file_info[-1][name] = results[name][0]
+
     return file_info, text_year, lemmas
 
 
 # function to add document data to csv file
-def save_to_csv(sents_in_file, output_file):   
+def save_to_csv(sents_in_file, output_file, extra_metrics=()):   
     # open output file
     with open(output_file, 'a', newline = '', encoding = 'utf-8') as csv_file:
-        # define csv header
-        header = ['text_id', 'author', 'year', 'journal', 
-                  'doc_len', 'vocab_size',
-                  'avg_srp', 'sum_srp', 'uid_dev', 'sigma_gamma']
-        writer = csv.DictWriter(csv_file, fieldnames = header)
+        writer = csv.DictWriter(csv_file, fieldnames = DOCUMENT_HEADER + list(extra_metrics))
         
         # add header if output file is empty
         if os.path.getsize(output_file) == 0:
@@ -142,7 +154,8 @@ def save_to_csv(sents_in_file, output_file):
         
     
 # function to process corpus files
-def process_corpus_files(data_folder, output_file):    
+def process_corpus_files(data_folder, output_file, extra_metrics=()):    
+    extra_metrics = metric_names(extra_metrics, DOCUMENT_HEADER)
     vocab_per_year = {}
     # go through each file in corpus data folder
     for file in os.listdir(data_folder):
@@ -156,14 +169,14 @@ def process_corpus_files(data_folder, output_file):
             file_path = os.path.join(data_folder, file)
             
             # open corpus file, extract sentences
-            sents_in_file, year, lemmas = parse_sentences(file_path)
+            sents_in_file, year, lemmas = parse_sentences(file_path, extra_metrics)
 
             if year not in vocab_per_year:
                 vocab_per_year[year] = set()
             vocab_per_year[year].update(lemmas)
             
             # add NP data to output csv file
-            save_to_csv(sents_in_file, output_file)
+            save_to_csv(sents_in_file, output_file, extra_metrics)
             print(f'Added sentences to output file: {output_file}')
         
     vocab_output = output_file.replace('.csv', '_vocab_per_year.csv')
@@ -173,20 +186,26 @@ def process_corpus_files(data_folder, output_file):
             f.write(f'{year},{len(vocab_per_year[year])}\n')
         
 # main function
-if __name__ == "__main__":
+def main(argv=None, prog=None):
    
+    parser = argparse.ArgumentParser(prog=prog, description='Extract documents and their surprisal-based complexity measures from .vrt corpus files.')
+    parser.add_argument('data_folder', help='folder with .vrt corpus files')
+    parser.add_argument('output_file', help='csv file the document data is appended to')
+    parser.add_argument('--extra-metrics', nargs='+', default=[], choices=list(METRICS), metavar='METRIC',
+                        help=f'further measures to calculate: {", ".join(METRICS)} (see metrics.py)')
+    args = parser.parse_args(argv)
 
     #data_folder = 'C:/Users/isabell/Documents/UdS/Corpus_Analysis/RSC/fluctuation_complexity/test'
     #data_folder = 'C:/Users/isabell/Documents/UdS/Corpus_Analysis/RSC/data/rsc_dep_gs_603_202412.vrt/files'
-    data_folder = sys.argv[1]
+    data_folder = args.data_folder
 
     # output_file = 'C:/Users/isabell/Documents/UdS/Corpus_Analysis/RSC/fluctuation_complexity/test/test_document_data.csv'
     #output_file = 'C:/Users/isabell/Documents/UdS/Corpus_Analysis/RSC/fluctuation_complexity/data/document_data.csv'
-    output_file = sys.argv[2]
+    output_file = args.output_file
 
     # process corpus files
-    process_corpus_files(data_folder, output_file)
-        
-                                
-        
-            
\ No newline at end of file
+    process_corpus_files(data_folder, output_file, args.extra_metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+script to get phrases (dependency subtrees) from corpus files and write info to csv
+- generalization of get_NP_data.py: which phrases are extracted is defined by
+  declarative selection rules instead of hard-coded criteria
+- a rule selects heads by their upos and deprel and can prune dependents of
+  the head (e.g. coordinated conjuncts) together with their subtrees
+- the dependency graph of each sentence is built once as flat arrays and all
+  rules are evaluated in a single pass over the sentence
+- several phrase types are written to the same csv, see column `phrase_type`
+- calculate Information Fluctuation Complexity and other surprisal-based
+  measures (see metrics.py) for all phrases of a file in one pass
+- extract metadata: text ID, author, year, journal
+
+"""
+
+import os
+import csv
+import json
+import argparse
+
+from .get_NP_data import read_sentences
+from .metrics import DEFAULT_METRICS, METRICS, compute_metrics_for, metric_names
+from .pipeline import process_files
+
+
+# built-in selection rules
+# - head_upos: upos tags of the head (None: any)
+# - head_deprel: dependency relations of the head (None: any)
+# - prune: dependency relations of dependents of the head which are removed
+#   together with their subtrees; only direct dependents of the head are
+#   pruned, so e.g. coordination inside a relative clause is kept
+PHRASE_RULES = {
+    # NPs as in get_NP_data.py: nominal (passive) subjects and direct objects
+    'NP': {'head_upos': ['NOUN'],
+           'head_deprel': ['nsubj', 'nsubj:pass', 'obj'],
+           'prune': []},
+    # same NPs, but only the first conjunct of a coordination
+    # ("Isabell and Arianna" -> "Isabell")
+    'NP_nocoord': {'head_upos': ['NOUN'],
+                   'head_deprel': ['nsubj', 'nsubj:pass', 'obj'],
+                   'prune': ['conj', 'cc']},
+    # NPs with common noun or proper noun heads
+    'NP_propn': {'head_upos': ['NOUN', 'PROPN'],
+                 'head_deprel': ['nsubj', 'nsubj:pass', 'obj'],
+                 'prune': ['conj', 'cc']},
+    # oblique nominals ("in the vessel")
+    'obl': {'head_upos': ['NOUN', 'PROPN'],
+            'head_deprel': ['obl'],
+            'prune': ['conj', 'cc']},
+    # nominal modifiers ("the weight of the air")
+    'nmod': {'head_upos': ['NOUN', 'PROPN'],
+             'head_deprel': ['nmod'],
+             'prune': ['conj', 'cc']},
+    # clauses headed by a verb
+    'clause': {'head_upos': ['VERB', 'AUX'],
+               'head_deprel': ['root', 'ccomp', 'xcomp', 'advcl', 'acl',
+                               'acl:relcl', 'csubj', 'csubj:pass', 'parataxis'],
+               'prune': ['conj', 'cc', 'parataxis']},
+    }
+
+
+# function to check a list of tags of a rule (e.g. from a json file, where
+# "NOUN" instead of ["NOUN"] would otherwise become a set of characters)
+def rule_tags(phrase_type, key, tags):
+    if not isinstance(tags, (list, tuple, set, frozenset)) or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError(f'{key} of rule {phrase_type!r} must be a list of strings, not {tags!r}')
+    return frozenset(tags)
+
+
+# function to turn rule definitions into the form used by the extractor
+def compile_rules(rules):
+    compiled = []
+    for phrase_type, rule in rules.items():
+        if not isinstance(rule, dict):
+            raise ValueError(f'rule {phrase_type!r} must be a dict, not {rule!r}')
+        unknown = set(rule) - {'head_upos', 'head_deprel', 'prune'}
+        if unknown:
+            raise ValueError(f'unknown keys in rule {phrase_type!r}: {sorted(unknown)}')
+        head_upos = rule.get('head_upos')
+        head_deprel = rule.get('head_deprel')
+        prune = rule.get('prune')
+        compiled.append((phrase_type,
+                         None if head_upos is None else rule_tags(phrase_type, 'head_upos', head_upos),
+                         None if head_deprel is None else rule_tags(phrase_type, 'head_deprel', head_deprel),
+                         frozenset() if prune is None else rule_tags(phrase_type, 'prune', prune)))
+    return compiled
+
+
+# function to select rules by name, or load them from a json file
+def load_rules(names=None, rules_file=None):
+    if rules_file is not None:
+        with open(rules_file, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+    else:
+        rules = PHRASE_RULES
+    if names:
+        missing = [name for name in names if name not in rules]
+        if missing:
+            raise ValueError(f'unknown phrase types: {missing}, available: {sorted(rules)}')
+        rules = {name: rules[name] for name in names}
+    return rules
+
+
+# function to build the dependency graph of a sentence as flat arrays
+# children of token h (1-based, 0 is the root) are
+# child_ids[offsets[h]:offsets[h+1]], in sentence order
+def build_children(heads):
+    n = len(heads)
+    offsets = [0] * (n + 2)
+    for head in heads:
+        if 0 <= head <= n: # heads outside the sentence are not attached
+            offsets[head + 1] += 1
+    for h in range(1, n + 2):
+        offsets[h] += offsets[h - 1]
+    child_ids = [0] * offsets[n + 1]
+    fill = offsets[:n + 1]
+    for idx, head in enumerate(heads, start=1):
+        if 0 <= head <= n:
+            child_ids[fill[head]] = idx
+            fill[head] += 1
+    return offsets, child_ids
+
+
+# function to get the sorted token indices of the subtree of a head
+def subtree(head, offsets, child_ids, deprels, prune):
+    visited = {head}
+    stack = [head]
+    while stack:
+        current = stack.pop()
+        for child in child_ids[offsets[current]:offsets[current + 1]]:
+            if child in visited:
+                continue
+            if current == head and deprels[child - 1] in prune:
+                continue
+            visited.add(child)
+            stack.append(child)
+    return sorted(visited)
+
+
+# function to identify all phrases of a sentence in one pass over its tokens
+# returns the phrases and the surprisal values of their tokens; the measures
+# are added for all phrases of a file at once by add_metrics
+def identify_phrases_in_sentence(current_sentence, metadata, compiled_rules):
+
+    phrases_in_sentence = [] # list for all phrases found in current sentence
+    srp_per_phrase = [] # surprisal values of the tokens of each phrase
+
+    heads = [int(word[5]) for word in current_sentence]
+    deprels = [word[6] for word in current_sentence]
+    offsets, child_ids = build_children(heads)
+
+    for idx, word in enumerate(current_sentence, start=1):
+        subtrees = {} # subtrees of this head, by pruned relations
+        for phrase_type, head_upos, head_deprel, prune in compiled_rules:
+            if head_upos is not None and word[2] not in head_upos:
+                continue
+            if head_deprel is not None and word[6] not in head_deprel:
+                continue
+
+            if prune not in subtrees:
+                subtrees[prune] = subtree(idx, offsets, child_ids, deprels, prune)
+
+            # get phrase tokens and following attributes:
+            # word, lemma, upos, head/parent, urel, s50
+            phrase = [[current_sentence[i-1][0], # word
+                       current_sentence[i-1][1], # lemma
+                       current_sentence[i-1][2], # upos
+                       current_sentence[i-1][5], # parent
+                       current_sentence[i-1][6], # urel
+                       current_sentence[i-1][-4]] # s50
+                      for i in subtrees[prune]]
+
+            # get surprisal values of all tokens
+            srp_per_phrase.append([float(tok[-1]) for tok in phrase])
+
+            phrases_in_sentence.append({
+                "text_id": metadata['text_id'],
+                "author": metadata['author'],
+                "year": metadata['year'],
+                "journal": metadata['journal'],
+                "phrase_type": phrase_type,
+                "phrase": phrase,
+                "phrase_len": len(phrase),
+                "phrase_str": ' '.join(token[0] for token in phrase),
+                "phrase_pos": '_'.join(token[2] for token in phrase),
+                "head_lemma": word[1],
+                "head_upos": word[2],
+                "head_synt_role": word[6],
+                })
+
+    return phrases_in_sentence, srp_per_phrase
+
+
+# function to add the measures of all phrases of a file in one pass
+def add_metrics(phrases, srp_per_phrase, metrics=DEFAULT_METRICS):
+    results = compute_metrics_for(srp_per_phrase, metrics)
+    for name in metrics:
+        for phrase, value in zip(phrases, results[name].tolist()):
+            phrase[name] = value
+    return phrases
+
+
+# function to extract phrases from corpus file
+def parse_sentences(file_path, rules=PHRASE_RULES, metrics=DEFAULT_METRICS, quarantine=None):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return parse_lines(f, rules=rules, metrics=metrics,
+                           quarantine=quarantine, source=file_path)
+
+
+# function to extract phrases from the lines of a corpus file
+# (sentences are read with get_NP_data.read_sentences, malformed lines are
+# handled as in get_NP_data.parse_lines)
+def parse_lines(lines, rules=PHRASE_RULES, metrics=DEFAULT_METRICS,
+                quarantine=None, source=None):
+
+    compiled_rules = compile_rules(rules)
+    metrics = metric_names(metrics)
+
+    phrases_in_file = [] # list for all phrases found in current file
+    srp_per_phrase = [] # surprisal values of the tokens of each phrase
+
+    for metadata, sent_start, current_sentence in read_sentences(lines, quarantine, source):
+        try:
+            phrases, srp_values = identify_phrases_in_sentence(
+                current_sentence, metadata, compiled_rules)
+            phrases_in_file.extend(phrases)
+            srp_per_phrase.extend(srp_values)
+        except Exception as e:
+            if quarantine is None:
+                raise
+            quarantine.add(source, sent_start, 'sentence', e,
+                           n_tokens=len(current_sentence))
+
+    return add_metrics(phrases_in_file, srp_per_phrase, metrics)
+
+
+# function to add phrase data to csv file
+def save_to_csv(phrases_in_file, output_file, metrics=DEFAULT_METRICS):
+    # open output file
+    with open(output_file, 'a', newline = '', encoding = 'utf-8') as csv_file:
+        # define csv header
+        header = ['text_id', 'author', 'year', 'journal', 'phrase_type',
+                  'phrase', 'phrase_len', 'phrase_str', 'phrase_pos',
+                  'head_lemma', 'head_upos', 'head_synt_role'] + list(metrics)
+        writer = csv.DictWriter(csv_file, fieldnames = header)
+
+        # add header if output file is empty
+        if os.path.getsize(output_file) == 0:
+            writer.writeheader()
+
+        # write phrase data to file
+        for row in phrases_in_file:
+            writer.writerow(row)
+
+
+# function to process corpus files
+# (options as in get_NP_data.process_corpus_files)
+def process_corpus_files(data_folder, output_file, rules=PHRASE_RULES,
+                         metrics=DEFAULT_METRICS, pipelined=False, queue_size=4,
+                         strict=False):
+    metrics = metric_names(metrics)
+
+    # get paths of all .vrt files in corpus data folder
+    file_paths = [os.path.join(data_folder, file)
+                  for file in os.listdir(data_folder)
+                  if file.endswith('.vrt')]
+
+    quarantine = None
+    if not strict:
+        from .quarantine import Quarantine, quarantine_file_for
+        quarantine = Quarantine(quarantine_file_for(output_file))
+
+    # function to parse the lines of one file
+    def parse(file_path, lines):
+        return parse_lines(lines, rules=rules, metrics=metrics,
+                           quarantine=quarantine, source=file_path)
+
+    # function to write the phrases of one file
+    def save(file_path, phrases_in_file):
+        save_to_csv(phrases_in_file, output_file, metrics)
+        print(f'Added phrases to output file: {output_file}')
+
+    try:
+        # serially or pipelined, see pipeline.py
+        process_files(file_paths, parse, save, pipelined=pipelined,
+                      queue_size=queue_size, quarantine=quarantine)
+    finally:
+        if quarantine is not None:
+            quarantine.close()
+            print(quarantine.summary())
+
+
+# main function
+def main(argv=None, prog=None):
+
+    parser = argparse.ArgumentParser(prog=prog, description='Extract phrases selected by declarative rules and their surprisal-based complexity measures from .vrt corpus files.')
+    parser.add_argument('data_folder', help='folder with .vrt corpus files')
+    parser.add_argument('output_file', help='csv file the phrase data is appended to')
+    parser.add_argument('--rules', nargs='+', metavar='PHRASE_TYPE',
+                        help=f'phrase types to extract (default: all), built-in: {", ".join(PHRASE_RULES)}')
+    parser.add_argument('--rules-file',
+                        help='json file with rule definitions {phrase_type: {"head_upos": [...], "head_deprel": [...], "prune": [...]}}')
+    parser.add_argument('--metrics', nargs='+', default=DEFAULT_METRICS, choices=list(METRICS), metavar='METRIC',
+                        help=f'measures to calculate: {", ".join(METRICS)} (default: {" ".join(DEFAULT_METRICS)}, see metrics.py)')
+    parser.add_argument('--pipelined', action='store_true',
+                        help='read, parse and write files concurrently')
+    parser.add_argument('--queue-size', type=int, default=4,
+                        help='max. number of files waiting between two pipeline stages (default: 4)')
+    parser.add_argument('--strict', action='store_true',
+                        help='stop at the first malformed line instead of skipping it')
+    args = parser.parse_args(argv)
+
+    # process corpus files
+    process_corpus_files(args.data_folder, args.output_file,
+                         rules=load_rules(args.rules, args.rules_file),
+                         metrics=args.metrics,
+                         pipelined=args.pipelined, queue_size=args.queue_size,
+                         strict=args.strict)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,13 +15,24 @@ script to get relevant sentences from corpus files and write info to csv
 import os
 import re
 import csv
-import sys
+import argparse
 
 import numpy as np
 
+from .metrics import METRICS, compute_metrics_for, metric_names
+
+
+# csv header of the sentence data (followed by the extra measures)
+SENTENCE_HEADER = ['text_id', 'author', 'year', 'journal', 
+                   'sent_id', 'sent_len', 'sent_str',
+                   'avg_srp', 'sum_srp', 'uid_dev', 'sigma_gamma']
+
 
 # function to extract sentences from corpus file
-def parse_sentences(file_path):
+# - extra_metrics: further measures from metrics.py, computed for all
+#   sentences of the file in one pass
+def parse_sentences(file_path, extra_metrics=()):
+    extra_metrics = metric_names(extra_metrics, SENTENCE_HEADER)
     
     # initialize variables for metadata
     text_id = None
@@ -33,6 +44,7 @@ def parse_sentences(file_path):
     in_sentence = False
     
     sents_in_file = [] # list for all sentences found in current file
+    srp_per_sent = [] # surprisal values of the tokens of each sentence
     
 
     with open(file_path, 'r', encoding='utf-8') as f:
@@ -74,6 +86,7 @@ def parse_sentences(file_path):
                     if sent:
                         # get surprisal values of all tokens
                         srp_values = [float(tok[-1]) for tok in sent]
+                        srp_per_sent.append(srp_values)
                         avg_srp = sum(srp_values) / len(srp_values)
                         sum_srp = sum(srp_values)
 
@@ -114,18 +127,21 @@ def parse_sentences(file_path):
                     token = line.split()
                     current_sentence.append(token) # add tokens to current sentence
 
+    # add extra measures
+    if extra_metrics:
+        results = compute_metrics_for(srp_per_sent, extra_metrics)
+        for name in extra_metrics:
+            for row, value in zip(sents_in_file, results[name].tolist()):
+                row[name] = value
+
     return sents_in_file
 
 
 # function to add sentence data to csv file
-def save_to_csv(sents_in_file, output_file):   
+def save_to_csv(sents_in_file, output_file, extra_metrics=()):   
     # open output file
     with open(output_file, 'a', newline = '', encoding = 'utf-8') as csv_file:
-        # define csv header
-        header = ['text_id', 'author', 'year', 'journal', 
-                  'sent_id', 'sent_len', 'sent_str',
-                  'avg_srp', 'sum_srp', 'uid_dev', 'sigma_gamma']
-        writer = csv.DictWriter(csv_file, fieldnames = header)
+        writer = csv.DictWriter(csv_file, fieldnames = SENTENCE_HEADER + list(extra_metrics))
         
         # add header if output file is empty
         if os.path.getsize(output_file) == 0:
@@ -138,42 +154,72 @@ def save_to_csv(sents_in_file, output_file):
         
     
 # function to process corpus files
-def process_corpus_files(data_folder, output_file):    
-    # go through each file in corpus data folder
-    for file in os.listdir(data_folder):
-        
-        # only consider .vrt files
-        if file.endswith('.vrt'):
-        
-            print(f'Processing file {file}...')
+# - with partition_by (e.g. ('journal', 'decade')), output_file is a folder
+#   and the sentences of each text are written to a part file in its
+#   partition (see partitioned.py); the index is written even if a file
+#   fails, e.g. a text without a text ID (which names the part file)
+def process_corpus_files(data_folder, output_file, extra_metrics=(), partition_by=None):    
+    extra_metrics = metric_names(extra_metrics, SENTENCE_HEADER)
+    partitions = None
+    if partition_by:
+        from .catalog import read_header
+        from .partitioned import PartitionedWriter, check_keys
+        check_keys(partition_by, SENTENCE_HEADER + list(extra_metrics))
+        partitions = PartitionedWriter(output_file, SENTENCE_HEADER + list(extra_metrics), partition_by)
+
+    try:
+        # go through each file in corpus data folder
+        for file in os.listdir(data_folder):
             
-            # get path of corpus file
-            file_path = os.path.join(data_folder, file)
+            # only consider .vrt files
+            if file.endswith('.vrt'):
             
-            # open corpus file, extract sentences
-            sents_in_file = parse_sentences(file_path)
-            
-            # add NP data to output csv file
-            save_to_csv(sents_in_file, output_file)
-            print(f'Added sentences to output file: {output_file}')
+                print(f'Processing file {file}...')
+                
+                # get path of corpus file
+                file_path = os.path.join(data_folder, file)
+                
+                # open corpus file, extract sentences
+                sents_in_file = parse_sentences(file_path, extra_metrics)
+                
+                # add NP data to output csv file
+                if partitions is not None:
+                    # old parts of a text without sentences are removed as well
+                    text_id = sents_in_file[0]['text_id'] if sents_in_file else read_header(file_path)['text_id']
+                    partitions.write((row for row in sents_in_file if row['sent_len']), [text_id])
+                else:
+                    save_to_csv(sents_in_file, output_file, extra_metrics)
+                print(f'Added sentences to output file: {output_file}')
+    finally:
+        if partitions is not None:
+            partitions.close()
+            print(partitions.summary())
         
         
         
 # main function
-if __name__ == "__main__":
+def main(argv=None, prog=None):
    
+    parser = argparse.ArgumentParser(prog=prog, description='Extract sentences and their surprisal-based complexity measures from .vrt corpus files.')
+    parser.add_argument('data_folder', help='folder with .vrt corpus files')
+    parser.add_argument('output_file', help='csv file the sentence data is appended to (a folder with --partition-by)')
+    parser.add_argument('--extra-metrics', nargs='+', default=[], choices=list(METRICS), metavar='METRIC',
+                        help=f'further measures to calculate: {", ".join(METRICS)} (see metrics.py)')
+    parser.add_argument('--partition-by', nargs='+', metavar='KEY', choices=('decade', *SENTENCE_HEADER),
+                        help='write one part file per text to partition folders by these keys, e.g. journal decade (see partitioned.py)')
+    args = parser.parse_args(argv)
 
     #data_folder = 'C:/Users/isabell/Documents/UdS/Corpus_Analysis/RSC/fluctuation_complexity/test'
     #data_folder = 'C:/Users/isabell/Documents/UdS/Corpus_Analysis/RSC/data/rsc_dep_gs_603_202412.vrt/files'
-    data_folder = sys.argv[1]
+    data_folder = args.data_folder
 
     #output_file = 'C:/Users/isabell/Documents/UdS/Corpus_Analysis/RSC/fluctuation_complexity/test/test_sentence_data.csv'
     #output_file = 'C:/Users/isabell/Documents/UdS/Corpus_Analysis/RSC/fluctuation_complexity/data/sentence_data.csv'
-    output_file = sys.argv[2]
+    output_file = args.output_file
 
     # process corpus files
-    process_corpus_files(data_folder, output_file)
-        
-                                
-        
-            
\ No newline at end of file
+    process_corpus_files(data_folder, output_file, args.extra_metrics, args.partition_by)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+memoization of repeated sentences (journal boilerplate, captions, headings)
+- key: hash of the token columns which the extraction depends on (word,
+  lemma, upos, head, deprel and surprisal)
+- value: whatever the extractor computed for the sentence, without metadata
+- bounded LRU cache in memory and, optionally, a sqlite file which keeps
+  the results between runs
+- counts hits and misses for the run summary, and the errors of the
+  memo itself (e.g. a locked or corrupt sqlite file), after which the
+  caller computes the result without the memo
+
+"""
+
+import pickle
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class SentenceMemo:
+    """LRU cache of per-sentence results, optionally backed by a sqlite file.
+
+    `namespace` is part of every key: change it when the extraction changes,
+    so that results of an older version in the sqlite file aren't used.
+    """
+
+    def __init__(self, maxsize=100000, path=None, namespace=''):
+        self.maxsize = maxsize
+        self.namespace = namespace.encode('utf-8')
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.errors = 0 # failed lookups or stores, see failed()
+        self._lock = threading.Lock()
+        self._db = None
+        self._pending = 0 # writes since the last commit
+        if path is not None:
+            # results are computed in the parser thread in pipelined mode
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS memo (key BLOB PRIMARY KEY, value BLOB)')
+
+    # function to get the key of a sentence (list of tokens)
+    def key(self, sentence):
+        h = hashlib.blake2b(self.namespace, digest_size=16)
+        for token in sentence:
+            # word, lemma, upos, head, deprel, s50
+            h.update('\x1f'.join((token[0], token[1], token[2], token[5], token[6], token[-4])).encode('utf-8'))
+            h.update(b'\x1e')
+        return h.digest()
+
+    # function to look up the result for a key, None if unknown
+    def get(self, key):
+        with self._lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key]
+            if self._db is not None:
+                row = self._db.execute('SELECT value FROM memo WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    value = pickle.loads(row[0])
+                    self._remember(key, value)
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    # function to store the result for a key
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO memo VALUES (?, ?)',
+                                 (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+                self._pending += 1
+                if self._pending >= 10000:
+                    self._db.commit()
+                    self._pending = 0
+
+    # function to record an error of get() or put()
+    def failed(self, error):
+        with self._lock:
+            self.errors += 1
+            if self.errors == 1:
+                print(f'Sentence memo error, sentences are extracted without it: {error!r}')
+
+    def _remember(self, key, value):
+        self.cache[key] = value
+        if len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
+    # function to summarize the hit rates
+    def summary(self):
+        n = self.hits + self.disk_hits + self.misses
+        errors = f', {self.errors} errors' if self.errors else ''
+        if not n:
+            return f'Sentence memo: no lookups{errors}'
+        return (f'Sentence memo: {self.hits + self.disk_hits} of {n} sentences reused '
+                f'({(self.hits + self.disk_hits) / n:.1%}; {self.hits} in memory, '
+                f'{self.disk_hits} from disk{errors})')
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+                self._db.close()
+                self._db = None
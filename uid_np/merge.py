@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+merge the outputs of several extraction runs (e.g. one per task of a
+cluster array job) into one output
+- csv files: the header is written once, the rows of every file are copied
+  as they are (all files must have the same header)
+- partitioned output folders (see partitioned.py): the part files are
+  copied into one folder and their index entries merged; if a text is in
+  several inputs, the parts of the last input are kept
+
+usage:
+    uid_np merge <output_1.csv> <output_2.csv> ... <merged.csv>
+    uid_np merge <NP_data_1> <NP_data_2> ... <NP_data>
+
+"""
+
+import os
+import shutil
+import argparse
+
+from .partitioned import INDEX_FILE, PartitionedWriter, read_index
+
+
+# function to merge csv files with the same header into one csv file
+def merge_csv(input_files, output_file):
+    header = None
+    with open(output_file, 'w', newline='', encoding='utf-8') as out:
+        for input_file in input_files:
+            with open(input_file, 'r', newline='', encoding='utf-8') as f:
+                first_line = f.readline()
+                if not first_line: # empty output of a task without rows
+                    continue
+                if header is None:
+                    header = first_line
+                    out.write(header)
+                elif first_line != header:
+                    raise ValueError(f'header of {input_file} differs from the header of {input_files[0]}')
+                shutil.copyfileobj(f, out)
+
+
+# function to merge partitioned output folders into one folder
+def merge_partitions(input_folders, output_folder):
+    writer = None
+    for input_folder in input_folders:
+        entries = read_index(input_folder)
+        if not entries:
+            continue
+        if writer is None:
+            keys = [key for key in entries[0] if key not in ('partition', 'part', 'text_id', 'n_rows')]
+            writer = PartitionedWriter(output_folder, header=[], keys=keys)
+        writer.add_parts(input_folder)
+    if writer is not None:
+        writer.close()
+        print(writer.summary())
+
+
+# main function
+def main(argv=None, prog=None):
+
+    parser = argparse.ArgumentParser(prog=prog, description='Merge csv outputs or partitioned output folders of several runs.')
+    parser.add_argument('inputs', nargs='+', help='csv files or partitioned output folders')
+    parser.add_argument('output', help='merged csv file or output folder')
+    args = parser.parse_args(argv)
+
+    folders = [os.path.exists(os.path.join(path, INDEX_FILE)) for path in args.inputs]
+    if all(folders):
+        merge_partitions(args.inputs, args.output)
+    elif not any(folders):
+        if os.path.abspath(args.output) in map(os.path.abspath, args.inputs):
+            parser.error('the output file must not be one of the inputs')
+        merge_csv(args.inputs, args.output)
+        print(f'Merged {len(args.inputs)} files into {args.output}')
+    else:
+        parser.error('inputs must be either all csv files or all partitioned output folders')
+
+
+if __name__ == "__main__":
+    main()
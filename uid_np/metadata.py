@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+metadata tags of the .vrt corpus files
+- tags and patterns to extract the text ID, author, year and journal from
+  the header of a text
+- no other imports, so that commands which only read the headers (e.g.
+  `uid_np catalog`) don't load numpy and the extraction modules
+
+"""
+
+
+# metadata tags and patterns to extract their values
+METADATA_TAGS = {
+    'text_id': ('<text_id ', r'<text_id\s(.*?)>'), # text ID
+    'author': ('<text_author ', r'<text_author\s(.*)>'), # author
+    'year': ('<text_year ', r'<text_year\s(.*?)>'), # year
+    'journal': ('<text_jrnl ', r'<text_jrnl\s(.*?)>'), # journal
+    }
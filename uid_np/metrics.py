@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+registry of surprisal-based complexity measures
+- every measure is a vectorized reduction over segments (NPs, phrases,
+  sentences or documents) of one flat array of surprisal values
+- all segments of a file are measured at once: the difference arrays are
+  computed once and shared by all measures
+- measures are registered with `register_metric`, so adding a measure
+  doesn't need another pass over the corpus
+- like in the extraction scripts, measures based on differences are only
+  defined for segments with at least 3 tokens (2 transitions)
+
+"""
+
+import numpy as np
+
+
+# registry: metric name -> (minimum segment length, function)
+METRICS = {}
+
+# measures written by the extraction scripts by default
+DEFAULT_METRICS = ['avg_srp', 'sum_srp', 'uid_dev', 'sigma_gamma']
+
+
+# decorator to add a measure to the registry
+def register_metric(name, min_len=3):
+    def register(func):
+        METRICS[name] = (min_len, func)
+        return func
+    return register
+
+
+# function to sum each segment of a flat array
+# (offsets: start of each segment plus the end of the last one)
+def segment_sum(x, offsets):
+    lengths = np.diff(offsets)
+    out = np.zeros(len(lengths))
+    nonempty = lengths > 0
+    if nonempty.any():
+        # np.add.reduceat needs increasing start indices with no empty segments
+        out[nonempty] = np.add.reduceat(x, offsets[:-1][nonempty])
+    return out
+
+
+# function to get the maximum of each segment of a flat array
+def segment_max(x, offsets):
+    lengths = np.diff(offsets)
+    out = np.full(len(lengths), np.nan)
+    nonempty = lengths > 0
+    if nonempty.any():
+        out[nonempty] = np.maximum.reduceat(x, offsets[:-1][nonempty])
+    return out
+
+
+class Segments:
+    """Surprisal values of consecutive segments and derived arrays.
+
+    `values` holds the surprisal values of all segments back to back and
+    segment i is `values[offsets[i]:offsets[i+1]]`. Derived arrays (e.g. the
+    differences within each segment) are computed on first use and shared
+    by all measures.
+    """
+
+    def __init__(self, values, offsets):
+        self.values = np.asarray(values, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.lengths = np.diff(self.offsets)
+        self._cache = {}
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    # mean surprisal of every segment
+    @property
+    def mean(self):
+        return self._cached('mean', lambda: divide(segment_sum(self.values, self.offsets), self.lengths))
+
+    # mask of the pairs of consecutive values which are in the same segment
+    @property
+    def within(self):
+        def compute():
+            within = np.ones(max(len(self.values) - 1, 0), dtype=bool)
+            ends = self.offsets[1:-1][self.lengths[:-1] > 0] - 1
+            within[ends[ends < len(within)]] = False
+            return within
+        return self._cached('within', compute)
+
+    # differences between consecutive values within each segment, back to back
+    @property
+    def diffs(self):
+        return self._cached('diffs', lambda: np.diff(self.values)[self.within])
+
+    # start of the differences of each segment plus the end of the last one
+    @property
+    def diff_offsets(self):
+        def compute():
+            n_diffs = np.maximum(self.lengths - 1, 0)
+            return np.concatenate([[0], np.cumsum(n_diffs)])
+        return self._cached('diff_offsets', compute)
+
+    # number of differences of every segment
+    @property
+    def n_diffs(self):
+        return np.diff(self.diff_offsets)
+
+    # mean difference of every segment
+    @property
+    def mean_diff(self):
+        return self._cached('mean_diff', lambda: divide(segment_sum(self.diffs, self.diff_offsets), self.n_diffs))
+
+
+# function to divide without warnings, x/0 is NaN
+def divide(a, b):
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    out = np.full(np.broadcast(a, b).shape, np.nan)
+    np.divide(a, b, out=out, where=b != 0)
+    return out
+
+
+# ============================================================================
+# MEASURES
+# ============================================================================
+
+@register_metric('avg_srp', min_len=1)
+def avg_srp(seg):
+    return seg.mean
+
+
+@register_metric('sum_srp', min_len=1)
+def sum_srp(seg):
+    return segment_sum(seg.values, seg.offsets)
+
+
+# Collins' (2014) UIDev, see get_NP_data.py
+@register_metric('uid_dev')
+def uid_dev(seg):
+    return divide(segment_sum(np.abs(seg.diffs), seg.diff_offsets), seg.n_diffs)
+
+
+# information fluctuation complexity, Brasolin, Bienati (2025), see get_NP_data.py
+@register_metric('sigma_gamma')
+def sigma_gamma(seg):
+    centered = seg.diffs - np.repeat(seg.mean_diff, seg.n_diffs)
+    return np.sqrt(divide(segment_sum(centered**2, seg.diff_offsets), seg.n_diffs))
+
+
+# sum of absolute differences normalized by length, see local_diff in tests.py
+@register_metric('local_diff')
+def local_diff(seg):
+    return divide(segment_sum(np.abs(seg.diffs), seg.diff_offsets), seg.lengths)
+
+
+# sum of squared differences normalized by length, see local_diff2 in tests.py
+@register_metric('local_diff2')
+def local_diff2(seg):
+    return divide(segment_sum(seg.diffs**2, seg.diff_offsets), seg.lengths)
+
+
+# variance of the surprisal values
+@register_metric('srp_var', min_len=2)
+def srp_var(seg):
+    centered = seg.values - np.repeat(seg.mean, seg.lengths)
+    return divide(segment_sum(centered**2, seg.offsets), seg.lengths)
+
+
+# lag-1 autocorrelation of the surprisal values
+# (NaN if all values of a segment are the same)
+@register_metric('lag1_autocorr')
+def lag1_autocorr(seg):
+    centered = seg.values - np.repeat(seg.mean, seg.lengths)
+    # products of consecutive centered values within each segment,
+    # same layout as seg.diffs
+    products = (centered[:-1] * centered[1:])[seg.within]
+    covariance = segment_sum(products, seg.diff_offsets)
+    variance = segment_sum(centered**2, seg.offsets)
+    return divide(covariance, variance)
+
+
+# largest absolute difference between consecutive tokens
+@register_metric('max_jump')
+def max_jump(seg):
+    return segment_max(np.abs(seg.diffs), seg.diff_offsets)
+
+
+# entropy of the distribution of surprisal over the tokens of a segment,
+# normalized by its maximum log(n): 1 if surprisal is spread uniformly,
+# lower the more it is concentrated on a few tokens
+# (NaN for segments with negative or only zero surprisal)
+@register_metric('norm_entropy', min_len=2)
+def norm_entropy(seg):
+    totals = segment_sum(seg.values, seg.offsets)
+    p = divide(seg.values, np.repeat(totals, seg.lengths))
+    plogp = np.zeros(len(p))
+    positive = p > 0
+    plogp[positive] = p[positive] * np.log(p[positive])
+    entropy = -segment_sum(plogp, seg.offsets)
+    negative = segment_sum((seg.values < 0).astype(float), seg.offsets) > 0
+    entropy[negative | ~(totals > 0)] = np.nan
+    return divide(entropy, np.log(np.maximum(seg.lengths, 1)))
+
+
+# ============================================================================
+# SENTENCE PROFILES
+# ============================================================================
+
+class SentenceProfile:
+    """Surprisal differences of one sentence, computed once and shared by
+    all NPs of the sentence (sentence UIDev and the transitions into and out
+    of each NP, see get_NP_data.py).
+    """
+
+    def __init__(self, srp_values):
+        self.srp = np.asarray(srp_values, dtype=float)
+        self.diffs = np.diff(self.srp)
+        self._uid_dev = float(np.mean(np.abs(self.diffs))) if len(self.srp) >= 3 else np.nan
+
+    # UIDev of the sentence, NaN for less than 3 tokens
+    def uid_dev(self):
+        return self._uid_dev
+
+    # surprisal difference from token i-1 to token i, NaN at the sentence boundaries
+    def transition(self, i):
+        if i <= 0 or i >= len(self.srp):
+            return np.nan
+        return float(self.diffs[i - 1])
+
+
+# function to compute several measures for all segments in one pass
+def compute_metrics(values, offsets, names=DEFAULT_METRICS):
+    """Compute the measures `names` for every segment.
+
+    `values` are the surprisal values of all segments back to back and
+    `offsets` the start of each segment plus the end of the last one.
+    Returns a dict metric name -> array with one value per segment, NaN
+    for segments shorter than the minimum length of the measure.
+    """
+    unknown = [name for name in names if name not in METRICS]
+    if unknown:
+        raise ValueError(f'unknown metrics: {unknown}, available: {sorted(METRICS)}')
+
+    seg = Segments(values, offsets)
+    results = {}
+    for name in names:
+        min_len, func = METRICS[name]
+        result = np.asarray(func(seg), dtype=float)
+        result[seg.lengths < min_len] = np.nan
+        results[name] = result
+    return results
+
+
+# function to check the names of measures before a run
+# - unknown names raise, so a typo fails before the first file is parsed
+# - names which are already columns of the table (base, e.g. uid_dev in the
+#   sentence data) and repeated names are dropped
+def metric_names(names, base=()):
+    unknown = [name for name in names if name not in METRICS]
+    if unknown:
+        raise ValueError(f'unknown metrics: {unknown}, available: {sorted(METRICS)}')
+    return [name for name in dict.fromkeys(names) if name not in base]
+
+
+# function to compute measures for a list of segments given as lists of values
+def compute_metrics_for(segments, names=DEFAULT_METRICS):
+    lengths = [len(segment) for segment in segments]
+    offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+    values = np.fromiter((v for segment in segments for v in segment),
+                         dtype=float, count=int(offsets[-1]))
+    return compute_metrics(values, offsets, names)
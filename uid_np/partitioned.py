@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+partitioned output of the extraction scripts
+- rows are written to a directory hierarchy by metadata, e.g.
+  <output_folder>/journal=rsta/decade=1850/part-<text_id>.csv
+- one part file per text and partition (a text has several parts if a
+  partition key varies within it, e.g. head_synt_role), so re-extracting a
+  text rewrites only its own part files and leaves all other texts
+  untouched; old parts of a re-extracted text which it no longer has are
+  removed
+- part files are named after the text ID, so rows without one are rejected
+- partition keys are columns of the rows, or decade (derived from year)
+- a small index file (_index.csv) lists partition values, part file and
+  number of rows of every part
+- readers select the parts they need in the index and open only those
+
+example:
+    from uid_np.partitioned import read_partitions
+    NPs = read_partitions('NP_data', {'journal': ['rsta'], 'decade': range(1800, 1860, 10)})
+
+"""
+
+import os
+import re
+import csv
+import shutil
+
+
+PARTITION_KEYS = ('journal', 'decade')
+INDEX_FILE = '_index.csv'
+MISSING = 'unknown' # partition value of rows without the metadata
+
+
+# function to make a metadata value safe for file names
+def safe_name(value):
+    return re.sub(r'[^\w.-]', '_', str(value))
+
+
+# function to get the name of the part file of a text
+def part_name(text_id):
+    return f'part-{safe_name(text_id)}.csv'
+
+
+# function to get the partition values of a row (decade is derived from year)
+def partition_values(row, keys=PARTITION_KEYS):
+    values = {}
+    for key in keys:
+        if key == 'decade':
+            try:
+                value = int(row['year']) // 10 * 10
+            except (KeyError, TypeError, ValueError):
+                value = None
+        else:
+            value = row.get(key)
+        values[key] = MISSING if value is None or value == '' else safe_name(value)
+    return values
+
+
+# function to check that partition keys are columns of the rows (header) or decade
+def check_keys(keys, header):
+    unknown = [key for key in keys if key != 'decade' and key not in header]
+    if unknown:
+        raise ValueError(f'unknown partition keys: {unknown}, available: {["decade", *header]}')
+
+
+# function to get the directory of a partition, relative to the output folder
+def partition_dir(values):
+    return '/'.join(f'{key}={value}' for key, value in values.items())
+
+
+# function to read the index of an output folder
+def read_index(output_folder):
+    index_file = os.path.join(output_folder, INDEX_FILE)
+    if not os.path.exists(index_file):
+        return []
+    with open(index_file, 'r', newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+class PartitionedWriter:
+    """Writes rows to part files by partition and keeps the index up to date.
+
+    The index is written by close(), so it's rewritten once per run and not
+    after every text, and before part files are removed, so that it never
+    lists a removed part (new parts are listed from close() on).
+    """
+
+    def __init__(self, output_folder, header, keys=PARTITION_KEYS):
+        self.output_folder = output_folder
+        self.header = list(header)
+        self.keys = tuple(keys)
+        os.makedirs(output_folder, exist_ok=True)
+        self.index = {(entry['partition'], entry['part']): entry
+                      for entry in read_index(output_folder)}
+        self.n_parts = 0 # parts written in this run
+
+    # function to write rows, replacing the part files of their texts
+    # - text_ids: texts which have been extracted; their parts are replaced
+    #   even if they have no rows (e.g. no NPs any more)
+    # - rows without a text ID raise a ValueError (nothing is written)
+    def write(self, rows, text_ids=()):
+        parts = {} # (partition values, text ID) -> rows
+        for row in rows:
+            text_id = row.get('text_id')
+            if text_id is None or text_id == '':
+                raise ValueError('rows without a text ID can\'t be written to a part file')
+            values = partition_values(row, self.keys)
+            parts.setdefault((tuple(values.items()), text_id), []).append(row)
+
+        # all parts of each text first, so that only parts it no longer has are removed
+        keep = {text_id: set() for text_id in text_ids if text_id is not None}
+        for values, text_id in parts:
+            keep.setdefault(text_id, set()).add((partition_dir(dict(values)), part_name(text_id)))
+        for text_id, keys in keep.items():
+            self._remove_text(text_id, keep=keys)
+
+        for (values, text_id), part_rows in parts.items():
+            partition = partition_dir(dict(values))
+            part = part_name(text_id)
+
+            # write to a temporary file first, so readers never see half a part
+            os.makedirs(os.path.join(self.output_folder, partition), exist_ok=True)
+            part_file = os.path.join(self.output_folder, partition, part)
+            with open(part_file + '.tmp', 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=self.header)
+                writer.writeheader()
+                writer.writerows(part_rows)
+            os.replace(part_file + '.tmp', part_file)
+
+            self.index[(partition, part)] = {'partition': partition, **dict(values),
+                                             'part': part, 'text_id': text_id,
+                                             'n_rows': len(part_rows)}
+            self.n_parts += 1
+
+    # function to copy the part files of another output folder (e.g. written
+    # by another task of an array job), with their index entries; the parts
+    # of its texts replace all parts of these texts in this folder
+    def add_parts(self, input_folder):
+        entries = read_index(input_folder)
+        keep = {}
+        for entry in entries:
+            keep.setdefault(entry['text_id'], set()).add((entry['partition'], entry['part']))
+        for text_id, keys in keep.items():
+            self._remove_text(text_id, keep=keys)
+
+        for entry in entries:
+            partition, part = entry['partition'], entry['part']
+            os.makedirs(os.path.join(self.output_folder, partition), exist_ok=True)
+            target = os.path.join(self.output_folder, partition, part)
+            shutil.copyfile(os.path.join(input_folder, partition, part), target + '.tmp')
+            os.replace(target + '.tmp', target)
+            self.index[(partition, part)] = {key: entry[key] for key in
+                                             ('partition', *self.keys, 'part', 'text_id', 'n_rows')}
+            self.n_parts += 1
+
+    # function to remove the parts of a text other than `keep` (a set of
+    # (partition, part) keys), e.g. if its year has been corrected since the
+    # last extraction
+    def _remove_text(self, text_id, keep):
+        removed = [key for key, entry in self.index.items()
+                   if entry['text_id'] == text_id and key not in keep]
+        if not removed:
+            return
+        for key in removed:
+            del self.index[key]
+        self.write_index()
+        for key in removed:
+            part_file = os.path.join(self.output_folder, *key)
+            if os.path.exists(part_file):
+                os.remove(part_file)
+
+    # function to write the index file
+    def write_index(self):
+        index_file = os.path.join(self.output_folder, INDEX_FILE)
+        with open(index_file + '.tmp', 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['partition', *self.keys, 'part', 'text_id', 'n_rows'])
+            writer.writeheader()
+            writer.writerows(self.index[key] for key in sorted(self.index))
+        os.replace(index_file + '.tmp', index_file)
+
+    def close(self):
+        self.write_index()
+
+    # function to summarize the output
+    def summary(self):
+        n_partitions = len({partition for partition, part in self.index})
+        return (f'Wrote {self.n_parts} parts; {len(self.index)} parts in '
+                f'{n_partitions} partitions in {self.output_folder}')
+
+
+# function to get the part files of the selected partitions
+# - filters {partition key: allowed values}, e.g. {'decade': range(1800, 1860, 10)};
+#   keys which are not partition keys are ignored
+def select_parts(output_folder, filters=None):
+    filters = {key: {str(value) for value in allowed}
+               for key, allowed in (filters or {}).items()}
+    return [os.path.join(output_folder, entry['partition'], entry['part'])
+            for entry in read_index(output_folder)
+            if all(entry[key] in allowed for key, allowed in filters.items() if key in entry)]
+
+
+# function to read the rows of the selected partitions as dicts (strings)
+def iter_rows(output_folder, filters=None):
+    for part_file in select_parts(output_folder, filters):
+        with open(part_file, 'r', newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+
+
+# function to read the selected partitions into one pandas DataFrame
+def read_partitions(output_folder, filters=None):
+    import pandas as pd
+    part_files = select_parts(output_folder, filters)
+    if not part_files:
+        return pd.DataFrame()
+    return pd.concat([pd.read_csv(part_file) for part_file in part_files], ignore_index=True)
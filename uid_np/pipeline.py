@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+pipelined execution of the extraction scripts
+- stage 1 (reader thread): read corpus files from disk
+- stage 2 (parser thread): parse sentences and compute metrics
+- stage 3 (caller's thread): write results to the output file
+- stages are connected by bounded queues: a full queue blocks the stage
+  in front of it, so at most `queue_size` files wait between two stages
+- process_files runs the same parse and save functions serially or
+  pipelined and skips files which can't be read or parsed
+
+"""
+
+import os
+import queue
+import threading
+
+
+# marker for the end of a stream
+_DONE = object()
+
+
+# function to put an item on a queue without blocking forever if another stage failed
+def _put(q, item, failed):
+    while not failed.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+# function to take an item from a queue without blocking forever if another stage failed
+def _get(q, failed):
+    while not failed.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+# stage 1: read each file into memory as a list of lines
+def _read_stage(file_paths, out_q, failed, errors, on_read_error):
+    try:
+        for file_path in file_paths:
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    lines = f.readlines()
+            except (OSError, UnicodeDecodeError) as e:
+                if on_read_error is None:
+                    raise
+                on_read_error(file_path, e)
+                continue
+            if not _put(out_q, (file_path, lines), failed):
+                return
+    except BaseException as e:
+        errors.append(e)
+        failed.set()
+    finally:
+        _put(out_q, _DONE, failed)
+
+
+# stage 2: parse the lines of each file and compute the metrics
+def _parse_stage(parse, in_q, out_q, failed, errors):
+    try:
+        while True:
+            item = _get(in_q, failed)
+            if item is _DONE:
+                break
+            file_path, lines = item
+            result = parse(file_path, lines)
+            if not _put(out_q, (file_path, result), failed):
+                return
+    except BaseException as e:
+        errors.append(e)
+        failed.set()
+    finally:
+        _put(out_q, _DONE, failed)
+
+
+# function to run read, parse and write stages concurrently
+def run_pipeline(file_paths, parse, save, queue_size=4, on_read_error=None):
+    """Read, parse and save `file_paths` in three concurrent stages.
+
+    `parse(file_path, lines)` is called in a worker thread and its result
+    is handed to `save(file_path, result)` in the calling thread, in the
+    same order as `file_paths`. If a file can't be read and `on_read_error`
+    is given, `on_read_error(file_path, exception)` is called and the file
+    is skipped. Any other exception in any stage stops the other stages and
+    is re-raised here.
+    """
+    read_q = queue.Queue(maxsize=queue_size)
+    parsed_q = queue.Queue(maxsize=queue_size)
+    failed = threading.Event()
+    errors = []
+
+    reader = threading.Thread(target=_read_stage,
+                              args=(file_paths, read_q, failed, errors, on_read_error),
+                              daemon=True)
+    parser = threading.Thread(target=_parse_stage,
+                              args=(parse, read_q, parsed_q, failed, errors),
+                              daemon=True)
+    reader.start()
+    parser.start()
+
+    try:
+        while True:
+            item = _get(parsed_q, failed)
+            if item is _DONE:
+                break
+            file_path, result = item
+            save(file_path, result)
+    except BaseException as e:
+        errors.append(e)
+        failed.set()
+    finally:
+        reader.join()
+        parser.join()
+
+    if errors:
+        raise errors[0]
+
+
+# function to count the tokens of a skipped file (0 if it can't be read)
+def count_file_tokens(file_path):
+    from .catalog import count_tokens
+    try:
+        return count_tokens(file_path)
+    except OSError:
+        return 0
+
+
+# function to parse and save files, serially or pipelined
+# - parse(file_path, lines) returns the rows of a file, save(file_path, rows)
+#   writes them; in serial mode, the lines are streamed from the open file
+# - with a quarantine (see quarantine.py), a file which can't be read or
+#   parsed is recorded there with its number of tokens and skipped (not
+#   saved); without one, the exception is raised
+def process_files(file_paths, parse, save, pipelined=False, queue_size=4, quarantine=None):
+
+    # function to skip a whole file
+    def skip_file(file_path, e):
+        if quarantine is None:
+            raise e
+        quarantine.add(file_path, None, 'file', e, n_tokens=count_file_tokens(file_path))
+
+    # function to parse one file, None if it's skipped
+    def parse_file(file_path, lines):
+        print(f'Processing file {os.path.basename(file_path)}...')
+        try:
+            return parse(file_path, lines)
+        except Exception as e:
+            skip_file(file_path, e)
+            return None
+
+    def save_file(file_path, rows):
+        if rows is not None:
+            save(file_path, rows)
+
+    if pipelined:
+        run_pipeline(file_paths, parse_file, save_file, queue_size=queue_size,
+                     on_read_error=skip_file if quarantine is not None else None)
+        return
+
+    for file_path in file_paths:
+        try:
+            f = open(file_path, 'r', encoding='utf-8')
+        except OSError as e:
+            skip_file(file_path, e)
+            continue
+        with f:
+            rows = parse_file(file_path, f)
+        save_file(file_path, rows)
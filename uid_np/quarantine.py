@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+quarantine for malformed parts of the corpus
+- malformed units (metadata lines, sentences, whole files) are skipped
+  instead of stopping the run
+- every skipped unit is written to a csv file with the file name, line
+  number, unit type and reason
+- skipped tokens and NPs are counted for the summary at the end of a run
+- like the output file, the quarantine file is appended to, so the records
+  of earlier runs are kept; without a file (e.g. in the worker processes of
+  server.py), the records are kept in memory
+
+"""
+
+import os
+import csv
+import threading
+
+
+# function to get the quarantine file of an output file:
+# <output_file without extension>_quarantine.csv
+def quarantine_file_for(output_file):
+    quarantine_file = os.path.splitext(output_file)[0] + '_quarantine.csv'
+    if os.path.abspath(quarantine_file) == os.path.abspath(output_file):
+        raise ValueError(f'quarantine file would overwrite the output file: {output_file}')
+    return quarantine_file
+
+
+class Quarantine:
+    """Collects malformed units in a quarantine csv file.
+
+    The file is only created when the first unit is added. Units can be
+    added from several threads (e.g. in pipelined mode). With
+    quarantine_file=None, the units are collected in `records` instead.
+    """
+
+    header = ['file', 'line', 'unit', 'reason']
+
+    def __init__(self, quarantine_file):
+        self.quarantine_file = quarantine_file
+        self.n_units = 0
+        self.n_tokens = 0
+        self.n_NPs = 0
+        self.records = [] # without a quarantine file
+        self._csv_file = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    # function to record a skipped unit
+    def add(self, file, line, unit, reason, n_tokens=0, n_NPs=0):
+        if isinstance(reason, BaseException):
+            reason = f'{type(reason).__name__}: {reason}'
+        with self._lock:
+            if self.quarantine_file is None:
+                self.records.append([file, line, unit, reason])
+            else:
+                if self._writer is None:
+                    self._csv_file = open(self.quarantine_file, 'a', newline='', encoding='utf-8')
+                    self._writer = csv.writer(self._csv_file)
+                    if self._csv_file.tell() == 0: # new file
+                        self._writer.writerow(self.header)
+                self._writer.writerow([file, line, unit, reason])
+                self._csv_file.flush()
+            self.n_units += 1
+            self.n_tokens += n_tokens
+            self.n_NPs += n_NPs
+
+    # function to summarize the skipped units
+    def summary(self):
+        if not self.n_units:
+            return 'No malformed units found.'
+        where = f', see {self.quarantine_file}' if self.quarantine_file is not None else ''
+        return (f'Skipped {self.n_units} malformed units '
+                f'({self.n_tokens} tokens, {self.n_NPs} NPs){where}')
+
+    def close(self):
+        with self._lock:
+            if self._csv_file is not None:
+                self._csv_file.close()
+                self._csv_file = None
+                self._writer = None
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+stratified reservoir sampling of NPs during extraction
+- keeps a reservoir of fixed size per stratum (e.g. year, journal and
+  head_synt_role) while streaming through the corpus (algorithm R)
+- whether an NP gets into its reservoir is decided before the NP is
+  extracted, so NPs which are not sampled cost almost nothing; a sampled
+  NP takes its place in the reservoir only once it has been extracted, so
+  an NP which can't be extracted (see quarantine.py) doesn't leave a gap
+  and isn't counted
+- the same seed and the same input files give the same sample
+
+"""
+
+import random
+
+
+class StratifiedReservoir:
+    """Uniform sample of at most `size` items for each stratum."""
+
+    def __init__(self, size, strata=('year', 'journal', 'head_synt_role'), seed=0):
+        self.size = size
+        self.strata = tuple(strata)
+        self.rng = random.Random(seed)
+        self.reservoirs = {} # stratum -> list of sampled items
+        self.seen = {} # stratum -> number of items seen
+
+    # function to get the stratum of an item from its attributes
+    def stratum(self, attributes):
+        return tuple(attributes[key] for key in self.strata)
+
+    # function to decide if the next item of a stratum is sampled
+    # - returns the slot in the reservoir for the item, or None
+    # - nothing is reserved: the item is counted and stored by place(), so
+    #   an item which isn't placed (e.g. it couldn't be extracted) is as if
+    #   it had never been offered
+    def offer(self, stratum):
+        n_seen = self.seen.get(stratum, 0) + 1
+        reservoir = self.reservoirs.get(stratum, [])
+        if len(reservoir) < self.size:
+            return len(reservoir) # next free slot
+        slot = self.rng.randrange(n_seen)
+        if slot < self.size:
+            return slot
+        self.seen[stratum] = n_seen # not sampled
+        return None
+
+    # function to put an item in the slot returned by offer()
+    def place(self, stratum, slot, item):
+        self.seen[stratum] = self.seen.get(stratum, 0) + 1
+        reservoir = self.reservoirs.setdefault(stratum, [])
+        if slot == len(reservoir):
+            reservoir.append(item)
+        else:
+            reservoir[slot] = item
+
+    # function to get all sampled items, by stratum
+    def items(self):
+        return [item
+                for stratum in sorted(self.reservoirs, key=lambda s: tuple(map(str, s)))
+                for item in self.reservoirs[stratum]]
+
+    # function to summarize the sample
+    def summary(self):
+        n_sampled = len(self.items())
+        n_seen = sum(self.seen.values())
+        return f'Sampled {n_sampled} of {n_seen} NPs in {len(self.reservoirs)} strata'
@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+"""
+local extraction service for interactive work
+- parses the corpus once (in parallel, with the extractors of api.py) and
+  keeps the NP and sentence tables in memory; with a cache file, the parsed
+  tables are stored as a pickle and reloaded as long as the corpus files
+  haven't changed
+- listens on localhost HTTP or on a Unix socket and answers JSON queries:
+  rows of a table, or aggregated measures, filtered by metadata and columns
+- every request is answered in its own thread; answers are kept in an LRU
+  cache keyed by the (canonical) request
+- malformed sentences and files are skipped as in the extraction scripts
+  (see quarantine.py) and listed in /status
+
+usage:
+    uid_np serve <corpus_folder> [--port 8765 | --socket <path>] [--cache-file corpus.pkl]
+
+query (POST /query), e.g. uid_dev of obj NPs with head "method" in 1800-1850:
+    {"table": "nps",
+     "where": {"head_synt_role": "obj", "head_lemma": "method", "year": {"min": 1800, "max": 1850}},
+     "measures": ["uid_dev"], "stats": ["count", "mean"], "group_by": ["journal"]}
+without measures, the matching rows are returned ("columns", "limit").
+GET /status describes the loaded tables and the skipped units, POST /reload
+parses the corpus again if files have changed.
+
+from Python:
+    from uid_np.server import query
+    query({"table": "nps", "where": {"head_synt_role": "obj"}, "measures": ["uid_dev"]})
+
+"""
+
+import os
+import json
+import pickle
+import argparse
+import threading
+import http.client
+import socketserver
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Pool
+
+import numpy as np
+
+
+TABLES = ('nps', 'sentences')
+STATS = ('count', 'mean', 'median', 'std', 'min', 'max', 'sum')
+
+
+class QueryError(ValueError):
+    """Malformed query, answered with status 400."""
+
+
+# function to extract one table from one file (runs in a worker process)
+# returns the table (None if the file was skipped) and the skipped units
+# (malformed NP sentences are skipped one by one, the sentence extractor
+# skips the whole file)
+def extract_table(args):
+    name, file_path = args
+    from . import api
+    from .quarantine import Quarantine
+    quarantine = Quarantine(None)
+    try:
+        if name == 'nps':
+            table = api.extract_nps(file_path, quarantine=quarantine)[0]
+        else:
+            table = api.extract_sentences(file_path)
+    except Exception as e:
+        from .pipeline import count_file_tokens
+        quarantine.add(file_path, None, 'file', e, n_tokens=count_file_tokens(file_path))
+        table = None
+    skipped = {'units': quarantine.n_units, 'tokens': quarantine.n_tokens,
+               'NPs': quarantine.n_NPs, 'records': quarantine.records}
+    return table, skipped
+
+
+# function to add up the skipped units of several files
+def merge_skipped(skipped_per_file):
+    merged = {'units': 0, 'tokens': 0, 'NPs': 0, 'records': []}
+    for skipped in skipped_per_file:
+        for key in ('units', 'tokens', 'NPs'):
+            merged[key] += skipped[key]
+        merged['records'].extend(skipped['records'])
+    return merged
+
+
+# function to get a signature of the corpus files (name, size, modification time)
+def corpus_signature(file_paths):
+    return sorted((os.path.basename(file_path), os.path.getsize(file_path), os.path.getmtime(file_path))
+                  for file_path in file_paths)
+
+
+# function to select the rows of a table with the conditions of a query
+# - value: equal to the value
+# - list: one of the values
+# - {"min": ..., "max": ...}: in the range (both inclusive, both optional)
+def select_rows(table, where):
+    mask = np.ones(len(table), dtype=bool)
+    for column, condition in where.items():
+        if column not in table.columns:
+            raise QueryError(f'unknown column: {column}')
+        values = table[column]
+        if isinstance(condition, dict):
+            unknown = set(condition) - {'min', 'max'}
+            if unknown:
+                raise QueryError(f'unknown range bounds for {column}: {sorted(unknown)}')
+            if 'min' in condition:
+                mask &= (values >= condition['min']).to_numpy()
+            if 'max' in condition:
+                mask &= (values <= condition['max']).to_numpy()
+        elif isinstance(condition, list):
+            mask &= values.isin(condition).to_numpy()
+        else:
+            mask &= (values == condition).to_numpy()
+    return table[mask]
+
+
+# function to turn a DataFrame into JSON-serializable columns and rows
+# (NaN becomes null)
+def to_json_table(frame):
+    rows = frame.astype(object).where(frame.notna(), None).values.tolist()
+    return {'columns': [str(column) for column in frame.columns], 'rows': rows}
+
+
+# function to answer a query on the loaded tables
+def run_query(tables, request):
+    if not isinstance(request, dict):
+        raise QueryError('query must be a JSON object')
+    name = request.get('table', 'nps')
+    if name not in tables:
+        raise QueryError(f'table not loaded: {name} (loaded: {sorted(tables)})')
+    table = tables[name]
+    selected = select_rows(table, request.get('where', {}))
+
+    measures = request.get('measures')
+    if not measures: # rows
+        columns = request.get('columns', list(table.columns))
+        unknown = [column for column in columns if column not in table.columns]
+        if unknown:
+            raise QueryError(f'unknown columns: {unknown}')
+        limit = request.get('limit', 1000)
+        return {'n_rows': len(selected), **to_json_table(selected[columns].head(limit))}
+
+    stats = request.get('stats', ['count', 'mean'])
+    group_by = request.get('group_by', [])
+    unknown = [column for column in list(measures) + list(group_by) if column not in table.columns]
+    if unknown:
+        raise QueryError(f'unknown columns: {unknown}')
+    if set(stats) - set(STATS):
+        raise QueryError(f'unknown stats: {sorted(set(stats) - set(STATS))} (known: {list(STATS)})')
+
+    if group_by:
+        result = selected.groupby(group_by)[measures].agg(stats)
+        result.columns = [f'{measure}_{stat}' for measure, stat in result.columns]
+        result = result.reset_index()
+    else:
+        import pandas as pd
+        result = pd.DataFrame({f'{measure}_{stat}': [selected[measure].agg(stat)]
+                               for measure in measures for stat in stats})
+    return {'n_rows': len(selected), **to_json_table(result)}
+
+
+class CorpusStore:
+    """Parsed tables of a corpus folder and an LRU cache of query answers."""
+
+    def __init__(self, data_folder, tables=('nps',), cache_file=None, workers=None,
+                 cache_size=1000):
+        unknown = set(tables) - set(TABLES)
+        if unknown:
+            raise ValueError(f'unknown tables: {sorted(unknown)} (known: {list(TABLES)})')
+        self.data_folder = data_folder
+        self.table_names = tuple(tables)
+        self.cache_file = cache_file
+        self.workers = workers
+        self.cache_size = cache_size
+        self.tables = {}
+        self.skipped = {} # table -> skipped units, see merge_skipped
+        self.signature = None
+        self.answers = OrderedDict() # canonical request -> encoded answer
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    # function to parse the corpus, or load it from the cache file
+    def load(self):
+        from . import api
+        import pandas as pd
+        file_paths = api.corpus_files(self.data_folder)
+        signature = corpus_signature(file_paths)
+        if signature == self.signature:
+            return False
+
+        tables = None
+        if self.cache_file is not None and os.path.exists(self.cache_file):
+            with open(self.cache_file, 'rb') as f:
+                cached = pickle.load(f)
+            if (cached['signature'] == signature and set(self.table_names) <= set(cached['tables'])
+                    and 'skipped' in cached):
+                tables, skipped = cached['tables'], cached['skipped']
+                print(f'Loaded tables from {self.cache_file}')
+
+        if tables is None:
+            print(f'Parsing {len(file_paths)} files...')
+            tables, skipped = {}, {}
+            with Pool(self.workers) as pool:
+                for name in self.table_names:
+                    results = pool.map(extract_table, [(name, file_path) for file_path in file_paths])
+                    frames = [table for table, _ in results if table is not None]
+                    tables[name] = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+                    skipped[name] = merge_skipped(skipped for _, skipped in results)
+            if self.cache_file is not None:
+                with open(self.cache_file + '.tmp', 'wb') as f:
+                    pickle.dump({'signature': signature, 'tables': tables, 'skipped': skipped},
+                                f, pickle.HIGHEST_PROTOCOL)
+                os.replace(self.cache_file + '.tmp', self.cache_file)
+
+        for name in self.table_names:
+            if skipped[name]['units']:
+                print(f'{name}: skipped {skipped[name]["units"]} malformed units '
+                      f'({skipped[name]["tokens"]} tokens, {skipped[name]["NPs"]} NPs), see /status')
+
+        with self._lock:
+            self.tables = {name: tables[name] for name in self.table_names}
+            self.skipped = {name: skipped[name] for name in self.table_names}
+            self.signature = signature
+            self.answers.clear()
+        return True
+
+    # function to answer a query (encoded JSON), from the cache if possible
+    def answer(self, request):
+        key = json.dumps(request, sort_keys=True, separators=(',', ':'))
+        with self._lock:
+            if key in self.answers:
+                self.answers.move_to_end(key)
+                self.hits += 1
+                return self.answers[key]
+            tables = self.tables
+        answer = json.dumps(run_query(tables, request)).encode('utf-8')
+        with self._lock:
+            if tables is self.tables: # not reloaded in the meantime
+                self.misses += 1
+                self.answers[key] = answer
+                if len(self.answers) > self.cache_size:
+                    self.answers.popitem(last=False)
+        return answer
+
+    # function to describe the loaded tables
+    def status(self):
+        with self._lock:
+            return {'data_folder': self.data_folder,
+                    'n_files': len(self.signature or []),
+                    'tables': {name: {'n_rows': len(table), 'columns': [str(c) for c in table.columns]}
+                               for name, table in self.tables.items()},
+                    'skipped': self.skipped,
+                    'cache': {'size': len(self.answers), 'hits': self.hits, 'misses': self.misses}}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Answers /status, /query and /reload with JSON."""
+
+    store = None # set by make_server
+
+    def _send(self, status, body):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/status':
+            self._send(200, self.store.status())
+        else:
+            self._send(404, {'error': f'unknown path: {self.path}'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        data = self.rfile.read(length)
+        try:
+            if self.path == '/query':
+                self._send(200, self.store.answer(json.loads(data or b'{}')))
+            elif self.path == '/reload':
+                self._send(200, {'reloaded': self.store.load()})
+            else:
+                self._send(404, {'error': f'unknown path: {self.path}'})
+        except (QueryError, json.JSONDecodeError) as e:
+            self._send(400, {'error': str(e)})
+        except Exception as e:
+            self._send(500, {'error': f'{type(e).__name__}: {e}'})
+
+    # Unix socket clients have no address
+    def address_string(self):
+        return self.client_address[0] if self.client_address else 'unix'
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ('unix', 0)
+
+
+# function to create the server for a store (localhost HTTP or Unix socket)
+def make_server(store, port=8765, socket_path=None):
+    handler = type('StoreRequestHandler', (RequestHandler,), {'store': store})
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer(('127.0.0.1', port), handler)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix socket."""
+
+    def __init__(self, socket_path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        import socket
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+# function to send a query to a running server and return its answer
+def query(request, port=8765, socket_path=None, path='/query', timeout=None):
+    if socket_path is not None:
+        connection = UnixHTTPConnection(socket_path, timeout=timeout)
+    else:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        if request is None:
+            connection.request('GET', path)
+        else:
+            connection.request('POST', path, body=json.dumps(request).encode('utf-8'),
+                               headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        answer = json.loads(response.read())
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise QueryError(answer.get('error', f'status {response.status}'))
+    return answer
+
+
+# main function
+def main(argv=None, prog=None):
+
+    parser = argparse.ArgumentParser(prog=prog, description='Keep the parsed corpus in memory and answer queries on localhost.')
+    parser.add_argument('data_folder', help='folder with .vrt corpus files')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='localhost port to listen on (default: 8765)')
+    parser.add_argument('--socket', help='Unix socket to listen on instead of the port')
+    parser.add_argument('--tables', nargs='+', default=['nps'], choices=TABLES,
+                        help='tables to load (default: nps)')
+    parser.add_argument('--cache-file',
+                        help='pickle file for the parsed tables, reused while the corpus files are unchanged')
+    parser.add_argument('--workers', type=int,
+                        help='number of processes for parsing (default: number of CPUs)')
+    parser.add_argument('--cache-size', type=int, default=1000,
+                        help='number of query answers to keep (default: 1000)')
+    args = parser.parse_args(argv)
+
+    store = CorpusStore(args.data_folder, args.tables, args.cache_file, args.workers, args.cache_size)
+    store.load()
+    server = make_server(store, args.port, args.socket)
+    print(f'Listening on {args.socket or f"127.0.0.1:{args.port}"}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
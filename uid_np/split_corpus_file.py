@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Nov  8 15:36:55 2024
+
+@author: isabell
+
+split corpus file into separate files, one per text
+consider only rsta and rstb texts
+- with processes > 1, the input file is divided into byte ranges which start
+  at a <text> tag, and the ranges are split in parallel processes; the
+  output is the same as with a serial split
+
+usage:
+    uid_np split <corpus_file.vrt> <output_folder> [--processes N]
+
+"""
+
+import os
+import argparse
+from multiprocessing import Pool
+
+
+# function to write one text (content after its <text> tag) to its own file
+# returns the text ID if the text was written, otherwise None
+def write_text(text, output_folder):
+    # get ID attribute and its value
+    id_start = text.find('<text_id ') + 9
+    id_end = text.find('>', id_start)
+    text_id = text[id_start:id_end]
+    
+    # take only rsta and rstb texts
+    if any(x in text_id for x in ["rsta", "rstb"]):
+        
+        # check if we already have this file
+        if not os.path.exists(os.path.join(output_folder, text_id, ".vrt")):
+    
+            # get content within <text> tag
+            text_content = "<text>\n" + text.strip() # add tag back to output
+    
+            # create new file with ID as file name
+            output_file = os.path.join(output_folder, f"{text_id}.vrt")
+            with open(output_file, 'w', encoding='utf-8') as output:
+                output.write(text_content)
+        
+            return text_id
+    return None
+
+
+# function to split the file by text
+def split_corpus_file(input_file, output_folder):
+    # create output folder if it doesn't exist
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    
+    with open(input_file, 'r', encoding='utf-8') as file:
+        content = file.read()
+        
+    # split content by <text> tags
+    texts = content.split("<text>")
+    
+    for text in texts[1:]: # skip first split since it is before first <text> tag
+        text_id = write_text(text, output_folder)
+        if text_id is not None:
+            print(f"Created file: {os.path.join(output_folder, f'{text_id}.vrt')}")
+
+
+# function to find the position of the next <text> tag at or after a position
+# (end of file if there is none)
+def next_text_tag(f, position, block_size=1 << 16):
+    tag = b"<text>"
+    f.seek(position)
+    carry = b""
+    while True:
+        block = f.read(block_size)
+        if not block:
+            return f.tell()
+        data = carry + block
+        found = data.find(tag)
+        if found >= 0:
+            return position - len(carry) + found
+        # keep the end of the block, the tag could start there
+        carry = data[-(len(tag) - 1):]
+        position += len(block)
+
+
+# function to divide the input file into byte ranges which start at a <text> tag
+# (the first range starts at the beginning of the file)
+def find_ranges(input_file, n_ranges):
+    size = os.path.getsize(input_file)
+    starts = {0}
+    with open(input_file, 'rb') as f:
+        for i in range(1, n_ranges):
+            starts.add(next_text_tag(f, size * i // n_ranges))
+    starts = sorted(start for start in starts if start < size) or [0]
+    return list(zip(starts, starts[1:] + [size]))
+
+
+# function to split one byte range of the input file
+# - only: if given, only texts with these IDs are written
+# returns the IDs of the written texts
+def split_range(input_file, start, end, output_folder, only=None):
+    with open(input_file, 'rb') as file:
+        file.seek(start)
+        # same newlines as when reading the whole file in text mode
+        content = file.read(end - start).decode('utf-8')
+    content = content.replace('\r\n', '\n').replace('\r', '\n')
+    
+    text_ids = []
+    for text in content.split("<text>")[1:]: # skip part before first <text> tag
+        if only is not None:
+            id_start = text.find('<text_id ') + 9
+            if text[id_start:text.find('>', id_start)] not in only:
+                continue
+        text_id = write_text(text, output_folder)
+        if text_id is not None:
+            text_ids.append(text_id)
+    return text_ids
+
+
+def _split_range(args):
+    return split_range(*args)
+
+
+# function to split the file by text in parallel processes
+# - chunk_size: max. bytes per range (bounds the memory of each process)
+def split_corpus_file_parallel(input_file, output_folder, processes=None, chunk_size=1 << 26):
+    processes = processes or os.cpu_count()
+    # create output folder if it doesn't exist
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    
+    size = os.path.getsize(input_file)
+    n_ranges = max(processes, -(-size // chunk_size))
+    ranges = find_ranges(input_file, n_ranges)
+    
+    with Pool(processes) as pool:
+        ids_per_range = pool.map(_split_range, [(input_file, start, end, output_folder)
+                                                for start, end in ranges])
+    
+    # a text ID which occurs in several ranges has been written by several
+    # processes: write it again from its last range, as in a serial split
+    last_range = {}
+    for i, text_ids in enumerate(ids_per_range):
+        for text_id in text_ids:
+            last_range.setdefault(text_id, []).append(i)
+    duplicates = {text_id: i[-1] for text_id, i in last_range.items() if len(set(i)) > 1}
+    for i in sorted(set(duplicates.values())):
+        start, end = ranges[i]
+        split_range(input_file, start, end, output_folder,
+                    only={text_id for text_id, j in duplicates.items() if j == i})
+    
+    for text_ids in ids_per_range:
+        for text_id in text_ids:
+            print(f"Created file: {os.path.join(output_folder, f'{text_id}.vrt')}")
+    return [text_id for text_ids in ids_per_range for text_id in text_ids]
+        
+        
+# main function
+def main(argv=None, prog=None):
+
+    parser = argparse.ArgumentParser(prog=prog, description='Split a corpus file into one file per rsta/rstb text.')
+    # input_file = 'C:/Users/isabell/Documents/UdS/Corpus_Analysis/RSC/data/rsc_dep_gs_603_202412.vrt/rsc_dep_gs_603_202412.vrt'
+    parser.add_argument('input_file', help='corpus file (.vrt)')
+    # output_folder = 'C:/Users/isabell/Documents/UdS/Corpus_Analysis/RSC/data/rsc_dep_gs_603_202412.vrt/files'
+    parser.add_argument('output_folder', help='folder for the text files (created if needed)')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='number of parallel processes (default: 1, serial split)')
+    args = parser.parse_args(argv)
+
+    # split corpus file
+    if args.processes > 1:
+        split_corpus_file_parallel(args.input_file, args.output_folder, args.processes)
+    else:
+        split_corpus_file(args.input_file, args.output_folder)
+
+
+if __name__ == "__main__":
+    main()